@@ -6,31 +6,88 @@ import tempfile
 import subprocess
 import sys
 import hashlib
+import base64
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Never shipped in a function zip: local secrets, deploy settings and build leftovers
+EXCLUDED_NAMES = {'.env', '.git', '.gitaction_properties', '__pycache__', '.DS_Store'}
+EXCLUDED_SUFFIXES = ('.pyc', '.pyo')
+# Fixed entry timestamp (the earliest a zip can store), so identical sources give an identical zip
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+def iter_package_files(folder_name, exclude=True):
+    """(path, archive name) pairs in a stable, sorted order."""
+    for root, dirs, files in os.walk(folder_name):
+        dirs[:] = sorted(d for d in dirs if not (exclude and d in EXCLUDED_NAMES))
+        for file in sorted(files):
+            if exclude and (file in EXCLUDED_NAMES or file.endswith(EXCLUDED_SUFFIXES)):
+                continue
+            path = os.path.join(root, file)
+            yield path, os.path.relpath(path, folder_name).replace(os.sep, '/')
+
+def write_deterministic_zip(zip_name, entries):
+    with zipfile.ZipFile(zip_name, 'w', zipfile.ZIP_DEFLATED, compresslevel=9) as zf:
+        for path, arcname in entries:
+            info = zipfile.ZipInfo(arcname, date_time=ZIP_DATE_TIME)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            mode = 0o755 if os.access(path, os.X_OK) else 0o644
+            info.external_attr = (0o100000 | mode) << 16
+            with open(path, 'rb') as src, zf.open(info, 'w') as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
 
 def create_lambda_zip(folder_name):
     zip_name = f"{folder_name}.zip"
-    with zipfile.ZipFile(zip_name, 'w') as zf:
-        for root, _, files in os.walk(folder_name):
-            for file in files:
-                zf.write(os.path.join(root, file), os.path.relpath(os.path.join(root, file), folder_name))
+    write_deterministic_zip(zip_name, iter_package_files(folder_name))
     return zip_name
 
-def lambda_exists(client, function_name):
-    try:
-        response = client.get_function(FunctionName=function_name)
-        return True
-    except Exception as e:
-        return False
+def zip_sha256(zip_name):
+    """Base64 SHA-256 of a zip, the same form as a function's CodeSha256."""
+    hasher = hashlib.sha256()
+    with open(zip_name, 'rb') as f:
+        while chunk := f.read(1024 * 1024):
+            hasher.update(chunk)
+    return base64.b64encode(hasher.digest()).decode()
 
-def update_lambda_code(client, function_name, zip_name):
+# With DEPLOY_BUCKET set, zips go to S3 through upload_file, which streams (multipart) from disk.
+# Without it they are sent inline, where the API base64-encodes the whole zip into the request body.
+DEPLOY_BUCKET = os.environ.get('DEPLOY_BUCKET')
+_s3_client = None
+_s3_lock = threading.Lock()
+
+def get_s3_client():
+    global _s3_client
+    with _s3_lock:
+        if _s3_client is None:
+            _s3_client = boto3.client('s3', region_name=os.environ.get('AWS_DEFAULT_REGION', 'ap-southeast-3'), endpoint_url=os.environ.get('S3_ENDPOINT_URL'))
+        return _s3_client
+
+def code_payload(zip_name, key):
+    """Code/Content argument for a zip: an S3 location when DEPLOY_BUCKET is set, else the zip bytes."""
+    if DEPLOY_BUCKET:
+        get_s3_client().upload_file(zip_name, DEPLOY_BUCKET, key)
+        return {'S3Bucket': DEPLOY_BUCKET, 'S3Key': key}
+    with open(zip_name, 'rb') as f:
+        return {'ZipFile': f.read()}
+
+def get_function_configuration(client, function_name):
     try:
-        response = client.update_function_code(
-            FunctionName=function_name,
-            ZipFile=open(zip_name, 'rb').read(),
-            Publish=True,
-        )
-    except Exception as e:
-        print(f"Error updating Lambda function code: {e}")
+        return client.get_function_configuration(FunctionName=function_name)
+    except client.exceptions.ResourceNotFoundException:
+        return None
+
+def wait_for_function(client, function_name, waiter_name='function_updated_v2'):
+    # Lambda rejects a configuration or code update while the previous one is still in progress
+    client.get_waiter(waiter_name).wait(FunctionName=function_name, WaiterConfig={'Delay': 2, 'MaxAttempts': 150})
+
+def update_lambda_code(client, function_name, zip_name, code_sha=None):
+    code_sha = code_sha or zip_sha256(zip_name)
+    client.update_function_code(
+        FunctionName=function_name,
+        Publish=True,
+        **code_payload(zip_name, f"{function_name}/{base64.b64decode(code_sha).hex()}.zip"),
+    )
+    wait_for_function(client, function_name)
 
 def get_role_arn_from_file(folder_name, filename='.gitaction_properties'):
     role_arn = None
@@ -44,23 +101,52 @@ def get_role_arn_from_file(folder_name, filename='.gitaction_properties'):
                     break
     return role_arn
 
-def create_layer_zip(folder_name):
-    layer_zip = f"{folder_name}_layer.zip"
+# Built layer zips are kept here, keyed by runtime and requirements.txt hash, along with pip's wheel cache
+LAYER_CACHE_DIR = os.environ.get('LAYER_CACHE_DIR', '.layer_cache')
+
+def layer_cache_path(folder_name, runtime='python3.8'):
+    requirements_hash = file_hash(os.path.join(folder_name, "requirements.txt"))
+    return os.path.join(LAYER_CACHE_DIR, f"{runtime}-{requirements_hash}.zip")
+
+def create_layer_zip(folder_name, runtime='python3.8'):
     requirements_file = os.path.join(folder_name, "requirements.txt")
 
     if os.path.isfile(requirements_file):
+        layer_zip = layer_cache_path(folder_name, runtime)
+        if os.path.isfile(layer_zip):
+            print(f"Reusing cached layer zip for {folder_name}: {layer_zip}")
+            return layer_zip
+
+        os.makedirs(LAYER_CACHE_DIR, exist_ok=True)
         with tempfile.TemporaryDirectory() as temp_dir:
             python_dir = os.path.join(temp_dir, 'python')
             os.makedirs(python_dir)
-            subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", requirements_file, "-t", python_dir])
+            subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", requirements_file, "-t", python_dir,
+                                   "--cache-dir", os.path.join(LAYER_CACHE_DIR, 'pip')])
 
-            with zipfile.ZipFile(layer_zip, 'w') as zf:
-                for root, _, files in os.walk(python_dir):
-                    for file in files:
-                        zf.write(os.path.join(root, file), os.path.join('python', os.path.relpath(os.path.join(root, file), python_dir)))
+            # Written under a unique temporary name so an interrupted or concurrent build never
+            # leaves a half-written cache entry
+            fd, tmp_zip = tempfile.mkstemp(dir=LAYER_CACHE_DIR, suffix='.tmp')
+            os.close(fd)
+            try:
+                write_deterministic_zip(tmp_zip, ((path, 'python/' + arcname) for path, arcname in iter_package_files(python_dir, exclude=False)))
+                os.replace(tmp_zip, layer_zip)
+            except BaseException:
+                os.remove(tmp_zip)
+                raise
         return layer_zip
     return None
 
+def prune_layer_cache(keep):
+    """Remove cached layer zips not used by this run, so the cache doesn't grow with every requirements change."""
+    if not os.path.isdir(LAYER_CACHE_DIR):
+        return
+    keep = {os.path.abspath(path) for path in keep}
+    for name in os.listdir(LAYER_CACHE_DIR):
+        path = os.path.join(LAYER_CACHE_DIR, name)
+        if name.endswith('.zip') and os.path.abspath(path) not in keep:
+            os.remove(path)
+
 def file_hash(file_path):
     hasher = hashlib.sha256()
     with open(file_path, 'rb') as f:
@@ -68,90 +154,185 @@ def file_hash(file_path):
             hasher.update(chunk)
     return hasher.hexdigest()
 
+def find_layer_version(client, layer_name, requirements_hash, runtime='python3.8'):
+    """ARN of a published layer version built from the same requirements.txt, searching every page."""
+    paginator = client.get_paginator('list_layer_versions')
+    for page in paginator.paginate(LayerName=layer_name, CompatibleRuntime=runtime):
+        for layer_version in page['LayerVersions']:
+            if layer_version.get('Description') == requirements_hash:
+                print(f"Reusing existing Lambda layer {layer_name} with version {layer_version['Version']}")
+                return layer_version['LayerVersionArn']
+    return None
+
 def create_or_update_layer(client, layer_name, layer_zip, folder_name, runtime='python3.8'):
-    layer_arn = None
     requirements_file = os.path.join(folder_name, "requirements.txt")
     requirements_hash = file_hash(requirements_file)
-    
-    try:
-        response = client.list_layer_versions(LayerName=layer_name, CompatibleRuntime=runtime)
-        layer_versions = response['LayerVersions']
 
-        for layer_version in layer_versions:
-            layer_description = layer_version['Description']
-            if layer_description == requirements_hash:
-                layer_arn = layer_version['LayerVersionArn']
-                print(f"Reusing existing Lambda layer {layer_name} with version {layer_version['Version']}")
-                break
-
-        if not layer_arn:
-            response = client.publish_layer_version(
-                LayerName=layer_name,
-                Description=requirements_hash,
-                Content={'ZipFile': open(layer_zip, 'rb').read()},
-                CompatibleRuntimes=[runtime],
-            )
-            layer_arn = response['LayerVersionArn']
-            print(f"Created new Lambda layer {layer_name} with version {response['Version']}")
-    except Exception as e:
-        print(f"Error creating Lambda layer: {e}")
+    layer_arn = find_layer_version(client, layer_name, requirements_hash, runtime)
+    if not layer_arn:
+        response = client.publish_layer_version(
+            LayerName=layer_name,
+            Description=requirements_hash,
+            Content=code_payload(layer_zip, f"{layer_name}/{requirements_hash}.zip"),
+            CompatibleRuntimes=[runtime],
+        )
+        layer_arn = response['LayerVersionArn']
+        print(f"Created new Lambda layer {layer_name} with version {response['Version']}")
 
     return layer_arn
 
 def update_lambda_layers(client, function_name, layer_arns):
-    try:
-        response = client.update_function_configuration(
-            FunctionName=function_name,
-            Layers=layer_arns,
-        )
-    except Exception as e:
-        print(f"Error updating Lambda layers: {e}")
+    client.update_function_configuration(
+        FunctionName=function_name,
+        Layers=layer_arns,
+    )
+    wait_for_function(client, function_name)
 
 def deploy_lambda(client, function_name, zip_name, role_arn, layer_arn=None, runtime='python3.8', region='ap-southeast-3'):
-    if lambda_exists(client, function_name):
+    """Create or update a function, returns 'created', 'updated' or 'unchanged'."""
+    code_sha = zip_sha256(zip_name)
+    config = get_function_configuration(client, function_name)
+    if config:
+        current_layers = [layer['Arn'] for layer in config.get('Layers', [])]
+        layers = [layer_arn] if layer_arn else current_layers
+        if config.get('CodeSha256') == code_sha and layers == current_layers:
+            print(f"Lambda function {function_name} is unchanged, skipping")
+            return 'unchanged'
+
         print(f"Updating existing Lambda function: {function_name}")
-        update_lambda_code(client, function_name, zip_name)
-    else:
-        print(f"Creating new Lambda function: {function_name}")
-        try:
-            response = client.create_function(
-                FunctionName=function_name,
-                Runtime=runtime,
-                Role=role_arn,
-                Handler='main.lambda_handler',  
-                Code={'ZipFile': open(zip_name, 'rb').read()},
-                Publish=True,
-            )
-        except Exception as e:
-            print(f"Error creating Lambda function: {e}")
-
-    if layer_arn:
-        update_lambda_layers(client, function_name, [layer_arn])
+        # Layers first, so the version published with the new code already includes them
+        wait_for_function(client, function_name)
+        if layers != current_layers:
+            update_lambda_layers(client, function_name, layers)
+        if config.get('CodeSha256') != code_sha:
+            update_lambda_code(client, function_name, zip_name, code_sha)
+        else:
+            client.publish_version(FunctionName=function_name, CodeSha256=code_sha)
+        return 'updated'
 
-if __name__ == "__main__":
-    repo_name = os.environ['REPO_NAME']
-    client = boto3.client('lambda', region_name='ap-southeast-3')
-    for folder_name in os.listdir():
-        if os.path.isdir(folder_name) and not folder_name.startswith('.'):
-            print(f"Processing folder {folder_name}")
-            role_arn = get_role_arn_from_file(folder_name)
+    print(f"Creating new Lambda function: {function_name}")
+    client.create_function(
+        FunctionName=function_name,
+        Runtime=runtime,
+        Role=role_arn,
+        Handler='main.lambda_handler',
+        Code=code_payload(zip_name, f"{function_name}/{base64.b64decode(code_sha).hex()}.zip"),
+        Layers=[layer_arn] if layer_arn else [],
+        Publish=True,
+    )
+    wait_for_function(client, function_name, 'function_active_v2')
+    return 'created'
+
+def plan_deployments(repo_name, root='.'):
+    """One entry per folder with a ROLE_ARN in its .gitaction_properties file."""
+    plan = []
+    for folder_name in sorted(os.listdir(root)):
+        if os.path.isdir(os.path.join(root, folder_name)) and not folder_name.startswith('.'):
+            role_arn = get_role_arn_from_file(os.path.join(root, folder_name))
             if role_arn:
                 print(f"Found role ARN for {folder_name}: {role_arn}")
                 lambda_name = f"{repo_name}_{folder_name}"
-                layer_name = f"{lambda_name}_layer"
-
-                layer_zip = create_layer_zip(folder_name)
-                if layer_zip:
-                    print(f"Created layer zip for {folder_name}: {layer_zip}")
-                    layer_arn = create_or_update_layer(client, layer_name, layer_zip, folder_name, runtime='python3.8')
-                    os.remove(layer_zip)
-                else:
-                    print(f"No requirements.txt found for {folder_name}, skipping layer creation.")
-                    layer_arn = None
-
-                zip_name = create_lambda_zip(folder_name)
-                print(f"Created Lambda zip for {folder_name}: {zip_name}")
-                deploy_lambda(client, lambda_name, zip_name, role_arn, layer_arn=layer_arn)
-                os.remove(zip_name)
+                plan.append({
+                    'folder': folder_name,
+                    'role_arn': role_arn,
+                    'lambda_name': lambda_name,
+                    'layer_name': f"{lambda_name}_layer",
+                })
             else:
                 print(f"Skipping {folder_name}: No role ARN found in .gitaction_properties file.")
+    return plan
+
+def build_artifacts(folder_name, build_layer=True, runtime='python3.8'):
+    """Build the layer and function zips for one folder. Runs in a worker process."""
+    layer_zip = None
+    if build_layer:
+        layer_zip = create_layer_zip(folder_name, runtime)
+        if layer_zip:
+            print(f"Created layer zip for {folder_name}: {layer_zip}")
+        else:
+            print(f"No requirements.txt found for {folder_name}, skipping layer creation.")
+    zip_name = create_lambda_zip(folder_name)
+    print(f"Created Lambda zip for {folder_name}: {zip_name}")
+    return zip_name, layer_zip
+
+def deploy_folder(client, item, build_future, runtime='python3.8', layer_future=None):
+    """Publish the layer and deploy one function once its build is done. Runs in a worker thread.
+
+    layer_future is the build of another folder with the same requirements.txt, whose layer zip
+    this folder shares instead of building its own.
+    """
+    zip_name, layer_zip = build_future.result()
+    try:
+        if layer_future is not None:
+            layer_zip = layer_future.result()[1]
+        layer_arn = item.get('layer_arn')
+        if layer_zip:
+            layer_arn = create_or_update_layer(client, item['layer_name'], layer_zip, item['folder'], runtime=runtime)
+        return deploy_lambda(client, item['lambda_name'], zip_name, item['role_arn'], layer_arn=layer_arn, runtime=runtime)
+    finally:
+        # Layer zips stay in LAYER_CACHE_DIR for the next run
+        if zip_name and os.path.exists(zip_name):
+            os.remove(zip_name)
+
+def deploy_all(client, plan, build_workers=None, deploy_workers=4, runtime='python3.8'):
+    """Build every folder in a process pool and deploy in a thread pool as builds finish.
+
+    Layers are looked up by requirements.txt hash before anything is built, so a folder whose
+    dependencies are already published skips pip entirely, and folders sharing a requirements.txt
+    hash build its layer once.
+
+    Returns {folder: deploy_lambda's status or the exception that stopped it}; one folder failing
+    doesn't stop the others.
+    """
+    results = {}
+    with ProcessPoolExecutor(max_workers=build_workers) as builders, ThreadPoolExecutor(max_workers=deploy_workers) as deployers:
+        builds = {}
+        # Cached layer zip path -> the build that produces it, so one requirements hash is built once
+        layer_builds = {}
+        layer_futures = {}
+        for item in plan:
+            requirements_file = os.path.join(item['folder'], "requirements.txt")
+            try:
+                if os.path.isfile(requirements_file):
+                    item['layer_arn'] = find_layer_version(client, item['layer_name'], file_hash(requirements_file), runtime)
+            except Exception as e:
+                results[item['folder']] = e
+                continue
+            build_layer = os.path.isfile(requirements_file) and not item.get('layer_arn')
+            layer_zip = layer_cache_path(item['folder'], runtime) if build_layer else None
+            if layer_zip in layer_builds:
+                layer_futures[item['folder']] = layer_builds[layer_zip]
+                build_layer = False
+            builds[item['folder']] = builders.submit(build_artifacts, item['folder'], build_layer, runtime)
+            if build_layer:
+                layer_builds[layer_zip] = builds[item['folder']]
+
+        deploys = {item['folder']: deployers.submit(deploy_folder, client, item, builds[item['folder']], runtime, layer_futures.get(item['folder'])) for item in plan if item['folder'] in builds}
+        for folder_name, future in deploys.items():
+            try:
+                results[folder_name] = future.result()
+            except Exception as e:
+                results[folder_name] = e
+
+    # Entries of folders that failed are kept too, the retry will need them
+    prune_layer_cache(layer_cache_path(item['folder'], runtime) for item in plan if os.path.isfile(os.path.join(item['folder'], "requirements.txt")))
+    return results
+
+def print_summary(results):
+    print("Deployment summary:")
+    for folder_name, result in results.items():
+        if isinstance(result, Exception):
+            print(f"  {folder_name}: FAILED ({type(result).__name__}: {result})")
+        else:
+            print(f"  {folder_name}: {result}")
+
+if __name__ == "__main__":
+    repo_name = os.environ['REPO_NAME']
+    # LAMBDA_ENDPOINT_URL points the client at a local stub (e.g. moto_server) for testing
+    client = boto3.client('lambda', region_name=os.environ.get('AWS_DEFAULT_REGION', 'ap-southeast-3'), endpoint_url=os.environ.get('LAMBDA_ENDPOINT_URL'))
+    plan = plan_deployments(repo_name)
+    build_workers = int(os.environ['BUILD_WORKERS']) if os.environ.get('BUILD_WORKERS') else None
+    results = deploy_all(client, plan, build_workers=build_workers, deploy_workers=int(os.environ.get('DEPLOY_WORKERS', '4')))
+    print_summary(results)
+    if any(isinstance(result, Exception) for result in results.values()):
+        sys.exit(1)
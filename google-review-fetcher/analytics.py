@@ -0,0 +1,362 @@
+"""Per-place monthly review aggregates over harvested reviews (needs numpy)
+
+Ratings, months, place codes and owner-answer flags are kept in compact NumPy
+arrays and grouped by (place_id, month_year) with vectorized bincounts. The
+aggregates, plus a hash of every review_id already counted, are saved to a small
+.npz state file, so new pages are folded into the existing totals instead of
+recomputing everything, and feeding the same reviews twice doesn't count them twice.
+
+    python analytics.py reviews.csv reviews/*.csv --state review_stats.npz --output review_stats.csv
+"""
+
+import argparse
+import csv
+import os
+import threading
+from itertools import repeat
+from typing import Dict, List, Sequence, Tuple
+
+from fetch_reviews import FIELDNAMES
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Columns read from the fetcher's CSV/Parquet output or tuple rows
+PLACE, REVIEW_ID, RATING, TIMESTAMP, OWNER_ANSWER = "place_id", "review_id", "review_rating", "review_timestamp", "owner_answer"
+INPUT_COLUMNS = (PLACE, REVIEW_ID, RATING, TIMESTAMP, OWNER_ANSWER)
+ROW_INDEXES = tuple(FIELDNAMES.index(name) for name in INPUT_COLUMNS)
+
+TABLE_COLUMNS = ["place_id", "month_year", "reviews", "rating", "reviews_per_score_1", "reviews_per_score_2", "reviews_per_score_3", "reviews_per_score_4", "reviews_per_score_5", "owner_answer_rate"]
+
+STATE_VERSION = 1
+
+def require_numpy():
+    if np is None:
+        raise ImportError("Review analytics needs numpy: pip install numpy")
+
+# Star ratings as they appear in rows (int), CSV ("4") or float-typed sources ("4.0", 4.0 == 4); anything else is 0
+RATING_CODES = {**{star: star for star in range(1, 6)}, **{str(star): star for star in range(1, 6)}, **{f"{star}.0": star for star in range(1, 6)}}
+
+def hash_ids(review_ids: Sequence[str]) -> "np.ndarray":
+    """Stable 64-bit hashes of review_ids, 0 for reviews without one
+    
+    Hashed column-wise over the ids' UTF-32 code units (two per 64-bit word), so a whole
+    batch costs a few dozen vectorized passes instead of one hashlib call per review.
+    """
+    ids = np.asarray(review_ids, dtype=str)
+    width = ids.dtype.itemsize // 4
+    width += width % 2
+    # Fixed little-endian layout so hashes match across platforms and runs
+    words = ids.astype(f"<U{width}").view(np.uint64).reshape(len(ids), width // 2)
+    lengths = np.char.str_len(ids)
+    hashes = np.full(len(ids), 0xCBF29CE484222325, np.uint64)
+    with np.errstate(over="ignore"):
+        for index, column in enumerate(words.T):
+            mixed = (hashes ^ column) * np.uint64(0x100000001B3)
+            mixed ^= mixed >> np.uint64(32)
+            # Only a row's own words count, so the padding of a batch doesn't change its hashes
+            hashes = np.where(lengths > 2 * index, mixed, hashes)
+        hashes ^= lengths.astype(np.uint64)
+        # splitmix64 finalizer
+        hashes ^= hashes >> np.uint64(30)
+        hashes *= np.uint64(0xBF58476D1CE4E5B9)
+        hashes ^= hashes >> np.uint64(27)
+        hashes *= np.uint64(0x94D049BB133111EB)
+        hashes ^= hashes >> np.uint64(31)
+    hashes[hashes == 0] = 1
+    hashes[ids == ""] = 0
+    return hashes
+
+def parse_timestamps(values: Sequence) -> "np.ndarray":
+    """ISO timestamp strings to datetime64[s]; empty or malformed values become NaT
+    
+    The whole batch parses in C once the "Z" suffix is cut off. Only a batch holding a
+    value NumPy rejects falls back to parsing value by value.
+    """
+    strings = [str(value)[:19] if value else "NaT" for value in values]
+    try:
+        return np.array(strings, dtype="datetime64[s]")
+    except ValueError:
+        return np.array([parse_timestamp(value) for value in strings], dtype="datetime64[s]")
+
+def parse_timestamp(value: str) -> "np.datetime64":
+    try:
+        return np.datetime64(value, "s")
+    except ValueError:
+        return np.datetime64("NaT", "s")
+
+class ReviewAggregator:
+    """Incremental per-(place, month) review statistics
+    
+    State arrays are aligned and sorted by group key (place code << 32 | months since
+    1970-01): review count, rating sum, per-star counts and owner answers. Added reviews
+    wait in compact column chunks and are folded into the state every chunk_size rows,
+    so adding one page at a time stays cheap.
+    """
+    
+    def __init__(self, chunk_size: int = 50000):
+        require_numpy()
+        self.chunk_size = chunk_size
+        self.places = []
+        self.place_codes = {}
+        self.keys = np.empty(0, np.int64)
+        self.reviews = np.empty(0, np.int64)
+        self.rating_sum = np.empty(0, np.int64)
+        self.score_counts = np.empty((0, 5), np.int64)
+        self.answered = np.empty(0, np.int64)
+        # Sorted hashes of counted review_ids, plus the ones still waiting in pending chunks
+        self.seen = np.empty(0, np.uint64)
+        self.pending_seen = set()
+        self.pending = []
+        self.pending_rows = 0
+        self.lock = threading.Lock()
+    
+    def place_code(self, place_id: str) -> int:
+        code = self.place_codes.get(place_id)
+        if code is None:
+            code = self.place_codes[place_id] = len(self.places)
+            self.places.append(place_id)
+        return code
+    
+    def add_rows(self, rows: Sequence[Tuple]) -> int:
+        """Add fetcher rows (tuples in FIELDNAMES order), returns how many were new"""
+        place, review_id, rating, timestamp, owner_answer = ROW_INDEXES
+        return self.add_columns(
+            [row[place] or "" for row in rows],
+            [row[review_id] or "" for row in rows],
+            [row[rating] for row in rows],
+            [row[timestamp] for row in rows],
+            [bool(row[owner_answer]) for row in rows],
+        )
+    
+    def add_columns(self, place_ids: List[str], review_ids: List[str], ratings: Sequence, timestamps: Sequence, answered: Sequence[bool]) -> int:
+        """Add reviews given column-wise, returns how many were new
+        
+        timestamps are ISO strings ("2024-05-01T10:00:00Z") or a datetime64 array. Reviews
+        without a valid timestamp can't be placed in a month and are skipped.
+        """
+        count = len(place_ids)
+        if not count:
+            return 0
+        
+        if not isinstance(timestamps, np.ndarray):
+            timestamps = parse_timestamps(timestamps)
+        months = timestamps.astype("datetime64[M]")
+        dated = ~np.isnat(months)
+        hashes = hash_ids(review_ids)
+        stars = np.fromiter(map(RATING_CODES.get, ratings, repeat(0, count)), np.int8, count)
+        
+        with self.lock:
+            keep = dated & self.unseen(hashes)
+            kept = int(keep.sum())
+            if not kept:
+                return 0
+            
+            for place_id in set(place_ids).difference(self.place_codes):
+                self.place_code(place_id)
+            codes = np.fromiter(map(self.place_codes.__getitem__, place_ids), np.int64, count)[keep]
+            chunk = (
+                (codes << 32) | months[keep].astype(np.int64) & 0xFFFFFFFF,
+                stars[keep],
+                np.asarray(answered, dtype=bool)[keep],
+            )
+            self.pending.append(chunk)
+            self.pending_seen.update(hashes[keep & (hashes != 0)].tolist())
+            self.pending_rows += kept
+            if self.pending_rows >= self.chunk_size:
+                self.fold()
+        return kept
+    
+    def unseen(self, hashes):
+        """Mask of reviews not counted yet (first occurrence within the batch too); reviews without an id always count"""
+        found = np.zeros(len(hashes), dtype=bool)
+        if len(self.seen):
+            positions = np.minimum(np.searchsorted(self.seen, hashes), len(self.seen) - 1)
+            found = self.seen[positions] == hashes
+        if self.pending_seen:
+            pending_seen = self.pending_seen
+            found |= np.fromiter((h in pending_seen for h in hashes.tolist()), bool, len(hashes))
+        
+        first = np.zeros(len(hashes), dtype=bool)
+        first[np.unique(hashes, return_index=True)[1]] = True
+        no_id = hashes == 0
+        return no_id | (~found & first)
+    
+    def fold(self):
+        """Group the pending reviews and merge them into the state arrays"""
+        if not self.pending:
+            return
+        keys = np.concatenate([chunk[0] for chunk in self.pending])
+        ratings = np.concatenate([chunk[1] for chunk in self.pending])
+        answered = np.concatenate([chunk[2] for chunk in self.pending])
+        
+        rated = ratings > 0
+        scores = np.zeros((len(keys), 5), np.int64)
+        scores[np.flatnonzero(rated), ratings[rated].astype(np.int64) - 1] = 1
+        
+        self.keys, (self.reviews, self.rating_sum, self.score_counts, self.answered) = group_sum(
+            np.concatenate([self.keys, keys]),
+            np.concatenate([self.reviews, np.ones(len(keys), np.int64)]),
+            np.concatenate([self.rating_sum, ratings.astype(np.int64)]),
+            np.concatenate([self.score_counts, scores]),
+            np.concatenate([self.answered, answered.astype(np.int64)]),
+        )
+        
+        self.seen = np.union1d(self.seen, np.fromiter(self.pending_seen, np.uint64, len(self.pending_seen)))
+        self.pending = []
+        self.pending_seen = set()
+        self.pending_rows = 0
+    
+    def table(self) -> Dict[str, "np.ndarray"]:
+        """Aggregate table as columns, sorted by place_id then month"""
+        with self.lock:
+            self.fold()
+            codes = self.keys >> 32
+            months = (self.keys & 0xFFFFFFFF).astype(np.int32)
+            names = np.array(self.places, dtype=str)
+            order = np.lexsort((months, names[codes]))
+            codes, months = codes[order], months[order]
+            reviews = self.reviews[order]
+            scores = self.score_counts[order]
+            rated = scores.sum(axis=1)
+            
+            table = {
+                "place_id": names[codes],
+                "month_year": np.datetime_as_string(months.astype("datetime64[M]"), unit="M"),
+                "reviews": reviews,
+                "rating": np.round(np.divide(self.rating_sum[order], rated, out=np.zeros(len(rated)), where=rated > 0), 3),
+                "owner_answer_rate": np.round(self.answered[order] / np.maximum(reviews, 1), 3),
+            }
+            for star in range(5):
+                table[f"reviews_per_score_{star + 1}"] = scores[:, star]
+            return table
+    
+    def write_csv(self, path: str):
+        table = self.table()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, mode="w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(TABLE_COLUMNS)
+            writer.writerows(zip(*(table[name].tolist() for name in TABLE_COLUMNS)))
+        os.replace(tmp_path, path)
+    
+    def add_csv(self, path: str, chunk_rows: int = 100000) -> int:
+        """Add every review in a fetcher CSV, returns how many were new"""
+        added = 0
+        with open(path, mode="r", newline="", encoding="utf-8") as file:
+            reader = csv.reader(file)
+            header = next(reader, None)
+            if not header:
+                return 0
+            indexes = [header.index(name) for name in INPUT_COLUMNS]
+            columns = [[] for _ in INPUT_COLUMNS]
+            for row in reader:
+                for column, index in zip(columns, indexes):
+                    column.append(row[index] if index < len(row) else "")
+                if len(columns[0]) >= chunk_rows:
+                    added += self.add_columns(columns[0], columns[1], columns[2], columns[3], [bool(value) for value in columns[4]])
+                    columns = [[] for _ in INPUT_COLUMNS]
+            added += self.add_columns(columns[0], columns[1], columns[2], columns[3], [bool(value) for value in columns[4]])
+        return added
+    
+    def add_parquet(self, path: str) -> int:
+        """Add every review in a fetcher Parquet file (needs pyarrow), returns how many were new"""
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Reading Parquet needs pyarrow: pip install pyarrow")
+        
+        added = 0
+        for batch in pq.ParquetFile(path).iter_batches(columns=list(INPUT_COLUMNS)):
+            columns = batch.to_pydict()
+            timestamps = batch.column(TIMESTAMP).to_numpy(zero_copy_only=False).astype("datetime64[s]")
+            added += self.add_columns(
+                [value or "" for value in columns[PLACE]],
+                [value or "" for value in columns[REVIEW_ID]],
+                columns[RATING],
+                timestamps,
+                [bool(value) for value in columns[OWNER_ANSWER]],
+            )
+        return added
+    
+    def add_file(self, path: str) -> int:
+        return self.add_parquet(path) if path.endswith(".parquet") else self.add_csv(path)
+    
+    def save(self, path: str):
+        """Write the state to an .npz file (atomically)"""
+        with self.lock:
+            self.fold()
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as file:
+                np.savez_compressed(
+                    file,
+                    version=np.array(STATE_VERSION),
+                    places=np.array(self.places, dtype=str),
+                    keys=self.keys,
+                    reviews=self.reviews,
+                    rating_sum=self.rating_sum,
+                    score_counts=self.score_counts,
+                    answered=self.answered,
+                    seen=self.seen,
+                )
+            os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path: str, chunk_size: int = 50000) -> "ReviewAggregator":
+        """Load a saved state, or start empty if path doesn't exist"""
+        aggregator = cls(chunk_size)
+        if not os.path.exists(path):
+            return aggregator
+        with np.load(path, allow_pickle=False) as state:
+            if int(state["version"]) != STATE_VERSION:
+                raise ValueError(f"Unsupported analytics state version in {path}")
+            aggregator.places = state["places"].tolist()
+            aggregator.place_codes = {place: code for code, place in enumerate(aggregator.places)}
+            aggregator.keys = state["keys"]
+            aggregator.reviews = state["reviews"]
+            aggregator.rating_sum = state["rating_sum"]
+            aggregator.score_counts = state["score_counts"].reshape(-1, 5)
+            aggregator.answered = state["answered"]
+            aggregator.seen = state["seen"]
+        return aggregator
+    
+    def summary(self) -> str:
+        with self.lock:
+            self.fold()
+            return f"Analytics: {int(self.reviews.sum())} reviews in {len(self.keys)} place-months across {len(self.places)} places"
+
+def group_sum(keys, *values) -> Tuple["np.ndarray", List["np.ndarray"]]:
+    """Sum each values array (1-D or 2-D, row-aligned with keys) per distinct key, returns (sorted keys, sums)"""
+    unique, inverse = np.unique(keys, return_inverse=True)
+    size = len(unique)
+    sums = []
+    for value in values:
+        if value.ndim == 1:
+            sums.append(np.bincount(inverse, weights=value, minlength=size).astype(np.int64))
+        else:
+            sums.append(np.stack([np.bincount(inverse, weights=value[:, column], minlength=size) for column in range(value.shape[1])], axis=1).astype(np.int64))
+    return unique.astype(np.int64), sums
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Per-place monthly rating aggregates over harvested reviews")
+    parser.add_argument("inputs", nargs="*", help="Review CSV or Parquet files written by fetch_reviews.py")
+    parser.add_argument("--state", default="review_stats.npz", help="Aggregate state, updated in place (reviews already counted are skipped)")
+    parser.add_argument("--output", default="review_stats.csv", help="Aggregate table (place_id, month_year, reviews, rating, reviews_per_score_1..5, owner_answer_rate)")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the existing state and recompute from the inputs")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    aggregator = ReviewAggregator() if args.rebuild else ReviewAggregator.load(args.state)
+    for path in args.inputs:
+        added = aggregator.add_file(path)
+        print(f"{path}: {added} new reviews")
+    aggregator.save(args.state)
+    aggregator.write_csv(args.output)
+    print(aggregator.summary())
+    print(f"Wrote {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Per-call requests.get vs the fetcher's pooled keep-alive session, against a local SerpApi stub
+
+    python benchmarks/bench_session.py --pages 300 --connect-delay 0.02
+
+Reports the connections the stub accepted and p50/p99 page latency for both transports.
+--connect-delay adds that many seconds to every new connection, to model the TCP + TLS
+handshake a real request to serpapi.com pays; loopback alone makes handshakes almost free.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from fetch_reviews import RateLimiter, SerpApiReviewFetcher
+from serpapi_stub import SerpApiStub, percentile
+
+class PerCallTransport:
+    """The old transport: module-level requests.get, a fresh connection for every call"""
+    
+    def get(self, url, params=None, timeout=None):
+        return requests.get(url, params=params, timeout=timeout)
+    
+    def close(self):
+        pass
+
+def page_latencies(fetcher: SerpApiReviewFetcher, pages: int) -> list:
+    latencies = []
+    next_page_token = None
+    for _ in range(pages):
+        started = time.perf_counter()
+        data = fetcher.fetch_reviews_page(place_id="P", next_page_token=next_page_token)
+        latencies.append(time.perf_counter() - started)
+        next_page_token = data.get("serpapi_pagination", {}).get("next_page_token")
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--connect-delay", type=float, default=0.02, help="Seconds added per new connection (default 0.02)")
+    args = parser.parse_args()
+    
+    with SerpApiStub(total_reviews=8 + 20 * args.pages, connect_delay=args.connect_delay) as stub:
+        for name in ("requests.get", "pooled session"):
+            fetcher = SerpApiReviewFetcher("benchmark", base_url=stub.url, rate_limiter=RateLimiter(0))
+            if name == "requests.get":
+                fetcher.session = PerCallTransport()
+            stub.reset()
+            started = time.perf_counter()
+            with fetcher:
+                latencies = page_latencies(fetcher, args.pages)
+            elapsed = time.perf_counter() - started
+            print(f"{name:>15}: {args.pages} pages in {elapsed:.2f}s, {stub.connections} connections, "
+                  f"p50 {percentile(latencies, 0.5) * 1000:.1f}ms, p99 {percentile(latencies, 0.99) * 1000:.1f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Per-page append_to_csv (reopen + DictWriter every page) vs one long-lived CsvSink
+
+    python benchmarks/bench_sink.py --rows 100000 --flush-every 1
+
+Writes the same synthetic pages of 20 formatted reviews both ways and reports time,
+file opens and write syscalls per 10k rows. Write syscalls come from /proc/self/io
+(Linux only).
+"""
+
+import argparse
+import builtins
+import csv
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fetch_reviews import FIELDNAMES, CsvSink, ReviewTransform
+from serpapi_stub import synthetic_review
+
+PAGE_SIZE = 20
+
+def legacy_append_to_csv(reviews, filename):
+    """append_to_csv as it was: fieldnames rebuilt, exists() checked, file reopened per page"""
+    if not reviews:
+        return
+    
+    fieldnames = list(FIELDNAMES)
+    file_exists = os.path.exists(filename)
+    
+    with open(filename, mode="a", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=fieldnames)
+        if not file_exists:
+            writer.writeheader()
+        writer.writerows(reviews)
+
+def write_syscalls() -> int:
+    try:
+        with open("/proc/self/io") as file:
+            for line in file:
+                if line.startswith("syscw:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return -1
+
+class OpenCounter:
+    """Count builtins.open calls while active"""
+    
+    def __init__(self):
+        self.opens = 0
+        self.original = builtins.open
+    
+    def __enter__(self):
+        def counting_open(*args, **kwargs):
+            self.opens += 1
+            return self.original(*args, **kwargs)
+        builtins.open = counting_open
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        builtins.open = self.original
+
+def measure(name, pages, write_pages, rows):
+    before = write_syscalls()
+    with OpenCounter() as counter:
+        started = time.perf_counter()
+        write_pages(pages)
+        elapsed = time.perf_counter() - started
+    syscalls = write_syscalls() - before if before >= 0 else None
+    scale = 10000 / rows
+    print(f"{name:>24}: {elapsed * scale * 1000:7.1f}ms, {counter.opens * scale:6.1f} opens, "
+          f"{'n/a' if syscalls is None else f'{syscalls * scale:6.0f}'} write syscalls per 10k rows")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--flush-every", type=int, default=1)
+    parser.add_argument("--fsync", action="store_true")
+    args = parser.parse_args()
+    
+    transform = ReviewTransform("P")
+    row_pages = [transform.rows([synthetic_review(index) for index in range(offset, min(offset + PAGE_SIZE, args.rows))]) for offset in range(0, args.rows, PAGE_SIZE)]
+    dict_pages = [[dict(zip(FIELDNAMES, row)) for row in rows] for rows in row_pages]
+    
+    with tempfile.TemporaryDirectory() as directory:
+        legacy_file = os.path.join(directory, "legacy.csv")
+        sink_file = os.path.join(directory, "sink.csv")
+        
+        def legacy(pages):
+            for page in pages:
+                legacy_append_to_csv(page, legacy_file)
+        
+        def sink(pages):
+            with CsvSink(sink_file, flush_every=args.flush_every, fsync=args.fsync) as out:
+                for page in pages:
+                    out.write(page)
+        
+        measure("append_to_csv", dict_pages, legacy, args.rows)
+        measure(f"CsvSink(flush_every={args.flush_every})", row_pages, sink, args.rows)
+        with open(legacy_file, "rb") as a, open(sink_file, "rb") as b:
+            print("identical output:", a.read() == b.read())
+
+if __name__ == "__main__":
+    main()
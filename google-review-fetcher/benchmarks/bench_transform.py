@@ -0,0 +1,183 @@
+"""Old format_review + filter_by_date vs the compiled ReviewTransform, over synthetic SerpApi reviews
+
+    python benchmarks/bench_transform.py --reviews 1000000 --start-date 2023-01-01 --end-date 2024-01-01
+
+Both paths process the same pages of 20 raw reviews and must produce the same rows.
+A pool of distinct records is reused across pages, so generating the input doesn't
+dominate the run or the memory use.
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fetch_reviews import FIELDNAMES, ReviewTransform
+from serpapi_stub import synthetic_review
+
+PAGE_SIZE = 20
+POOL_SIZE = 20000
+
+class LegacyTransform:
+    """format_review, clean_text and filter_by_date as they were
+    
+    A 58-key dict per review, iso_date parsed in format_review and reparsed in
+    filter_by_date, and the date bounds parsed again for every review.
+    """
+    
+    def clean_text(self, text: str) -> str:
+        """Clean text by replacing newlines/tabs with spaces and normalizing whitespace"""
+        if not text:
+            return ""
+        return " ".join(text.replace("\r\n", " ").replace("\r", " ").replace("\n", " ").replace("\t", " ").split())
+    
+    def format_review(self, review: Dict, place_id: Optional[str] = None) -> Dict:
+        """Format review to match CSV schema"""
+        iso_date = review.get("iso_date", "")
+        review_date = None
+        
+        if iso_date:
+            try:
+                review_date = datetime.fromisoformat(iso_date.replace("Z", "+00:00"))
+            except:
+                pass
+        
+        images = review.get("images", [])
+        image_urls = images if isinstance(images, list) else []
+        
+        owner_answer = review.get("owner_answer", {})
+        
+        user = review.get("user", {})
+        
+        return {
+            "query": "",
+            "name": "",
+            "google_id": "",
+            "place_id": place_id,
+            "location_link": "",
+            "reviews_link": "",
+            "reviews": "",
+            "rating": review.get("rating"),
+            "review_id": review.get("review_id", ""),
+            "review_pagination_id": "",
+            "author_link": user.get("link", ""),
+            "author_title": user.get("name", ""),
+            "author_id": user.get("contributor_id", ""),
+            "author_image": user.get("thumbnail", ""),
+            "author_reviews_count": user.get("reviews", ""),
+            "author_ratings_count": "",
+            "review_text": self.clean_text(review.get("snippet", "")),
+            "review_img_urls": "|".join(image_urls),
+            "review_img_url": image_urls[0] if image_urls else "",
+            "review_photo_ids": "",
+            "owner_answer": self.clean_text(owner_answer.get("answer", "")) if owner_answer else "",
+            "owner_answer_timestamp": owner_answer.get("time", "") if owner_answer else "",
+            "owner_answer_timestamp_datetime_utc": datetime.fromtimestamp(owner_answer.get("time", 0)).isoformat() if owner_answer and owner_answer.get("time") else "",
+            "review_link": review.get("link", ""),
+            "review_rating": review.get("rating"),
+            "review_timestamp": review.get("iso_date", ""),
+            "review_datetime_utc": review_date.isoformat() if review_date else "",
+            "months": "",
+            "year": review_date.year if review_date else "",
+            "month_year": review_date.strftime("%Y-%m") if review_date else "",
+            "review_likes": review.get("likes", ""),
+            "reviews_id": "",
+            "reviews_per_score_1": "",
+            "reviews_per_score_2": "",
+            "reviews_per_score_3": "",
+            "reviews_per_score_4": "",
+            "reviews_per_score_5": "",
+            "review_questions_Service": "",
+            "review_questions_Meal type": "",
+            "review_questions_Food": "",
+            "review_questions_Atmosphere": "",
+            "review_questions_Price per person": "",
+            "review_questions_Recommended dishes": "",
+            "review_questions": "",
+            "review_questions_Noise level": "",
+            "review_questions_Wait time": "",
+            "review_questions_Group size": "",
+            "review_questions_Special offers": "",
+            "review_questions_Parking space": "",
+            "review_questions_Parking options": "",
+            "review_questions_None": "",
+            "review_questions_Dietary restrictions": "",
+            "review_questions_Vegetarian options": "",
+            "review_questions_Parking": "",
+            "review_questions_Kid-friendliness": "",
+            "review_questions_Wheelchair accessibility": "",
+            "review_questions_Reservation": "",
+            "review_questions_Seating type": ""
+        }
+    
+    def filter_by_date(self, reviews: List[Dict], start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict]:
+        """Filter reviews by date range"""
+        if not start_date and not end_date:
+            return reviews
+        
+        filtered = []
+        
+        for review in reviews:
+            date_str = review.get("review_datetime_utc", "")
+            if not date_str:
+                continue
+            
+            try:
+                review_date = datetime.fromisoformat(date_str)
+                review_date = review_date.replace(tzinfo=None)
+            except:
+                continue
+            
+            if start_date:
+                start_dt = datetime.strptime(start_date, "%Y-%m-%d")
+                if review_date < start_dt:
+                    continue
+            
+            if end_date:
+                end_dt = datetime.strptime(end_date, "%Y-%m-%d")
+                if review_date > end_dt:
+                    continue
+            
+            filtered.append(review)
+        
+        return filtered
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reviews", type=int, default=1000000)
+    parser.add_argument("--start-date", default="2023-01-01")
+    parser.add_argument("--end-date", default="2024-01-01")
+    args = parser.parse_args()
+    
+    pool = [synthetic_review(index) for index in range(POOL_SIZE)]
+    pages = [pool[offset:offset + PAGE_SIZE] for offset in range(0, POOL_SIZE, PAGE_SIZE)]
+    page_count = args.reviews // PAGE_SIZE
+    
+    legacy = LegacyTransform()
+    started = time.perf_counter()
+    legacy_kept = 0
+    for number in range(page_count):
+        formatted = [legacy.format_review(review, "P") for review in pages[number % len(pages)]]
+        legacy_kept += len(legacy.filter_by_date(formatted, args.start_date, args.end_date))
+    legacy_time = time.perf_counter() - started
+    
+    transform = ReviewTransform("P", args.start_date, args.end_date)
+    started = time.perf_counter()
+    kept = 0
+    for number in range(page_count):
+        kept += len(transform.rows(pages[number % len(pages)]))
+    transform_time = time.perf_counter() - started
+    
+    reviews = page_count * PAGE_SIZE
+    print(f"format_review + filter_by_date: {reviews} reviews in {legacy_time:.2f}s ({reviews / legacy_time:,.0f}/s), {legacy_kept} kept")
+    print(f"               ReviewTransform: {reviews} reviews in {transform_time:.2f}s ({reviews / transform_time:,.0f}/s), {kept} kept")
+    
+    expected = [tuple(row[name] for name in FIELDNAMES) for row in legacy.filter_by_date([legacy.format_review(review, "P") for review in pool], args.start_date, args.end_date)]
+    print("identical rows:", expected == ReviewTransform("P", args.start_date, args.end_date).rows(pool))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Local SerpApi stand-in and synthetic review records for the benchmarks
+
+The stub serves google_maps_reviews pages newest first (8 reviews on the first page,
+`num` after that) and counts the TCP connections it accepts, so connection reuse can
+be measured without spending credits.
+"""
+
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+NEWEST = datetime(2024, 6, 1)
+
+def synthetic_review(index: int, place: str = "P") -> Dict:
+    """One SerpApi-shaped review, an hour older per index, with the nested blobs real pages carry"""
+    review_date = NEWEST - timedelta(hours=index)
+    review = {
+        "review_id": f"{place}-r{index}",
+        "link": f"https://www.google.com/maps/reviews/data={place}-r{index}",
+        "rating": index % 5 + 1,
+        "iso_date": review_date.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "snippet": f"Review {index}\nGood food, friendly staff.\tWould come back " * 3,
+        "likes": index % 7,
+        "user": {"name": f"User {index}", "link": f"https://www.google.com/maps/contrib/{index}", "contributor_id": str(index), "thumbnail": "https://lh3.googleusercontent.com/a/x", "reviews": index % 50},
+        "images": [f"https://lh5.googleusercontent.com/p/{index}-{n}" for n in range(index % 3)],
+    }
+    if index % 3 == 0:
+        review["owner_answer"] = {"answer": "Thank you for visiting!", "time": 1700000000 + index}
+    return review
+
+def synthetic_page(offset: int, count: int, total: int, place: str = "P") -> Dict:
+    """A google_maps_reviews response body for reviews offset..offset+count"""
+    data = {"reviews": [synthetic_review(index, place) for index in range(offset, min(offset + count, total))]}
+    if offset == 0:
+        data["place_info"] = {"reviews": total}
+    if offset + count < total:
+        data["serpapi_pagination"] = {"next_page_token": str(offset + count)}
+    return data
+
+class SerpApiStub:
+    """Threaded HTTP/1.1 keep-alive server answering like SerpApi
+    
+    connect_delay seconds are slept once per accepted connection, to stand in for the
+    TCP + TLS handshake round trips a real connection to serpapi.com costs.
+    """
+    
+    def __init__(self, total_reviews: int = 6000, connect_delay: float = 0.0):
+        self.total_reviews = total_reviews
+        self.connect_delay = connect_delay
+        self.connections = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Send headers and body as one segment, as real servers do; otherwise Nagle's
+            # algorithm and delayed ACKs add ~40ms to every request on a kept-alive connection
+            disable_nagle_algorithm = True
+            wbufsize = 1 << 16
+            
+            def setup(self):
+                with stub.lock:
+                    stub.connections += 1
+                if stub.connect_delay:
+                    time.sleep(stub.connect_delay)
+                super().setup()
+            
+            def log_message(self, format, *args):
+                pass
+            
+            def do_GET(self):
+                with stub.lock:
+                    stub.requests += 1
+                query = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+                token = query.get("next_page_token")
+                offset = int(token) if token else 0
+                count = int(query.get("num", 8)) if token else 8
+                place = query.get("place_id") or query.get("data_id") or "P"
+                body = json.dumps(synthetic_page(offset, count, stub.total_reviews, place)).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+        
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/search"
+    
+    def reset(self):
+        with self.lock:
+            self.connections = 0
+            self.requests = 0
+    
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.server.shutdown()
+        self.server.server_close()
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of samples"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
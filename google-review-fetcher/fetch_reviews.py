@@ -1,18 +1,852 @@
 import requests
+from requests.adapters import HTTPAdapter
+import argparse
 import csv
+import hashlib
+import json
 import os
+import math
+import random
 import re
+import shutil
+import sqlite3
+import threading
 import time
-from typing import List, Dict, Optional
-from datetime import datetime
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 
 load_dotenv()
 
+try:
+    import brotli  # noqa: F401  (urllib3 only decodes br when brotli is installed)
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+FIELDNAMES = ["query", "name", "google_id", "place_id", "location_link", "reviews_link", "reviews", "rating", "review_id", "review_pagination_id", "author_link", "author_title", "author_id", "author_image", "author_reviews_count", "author_ratings_count", "review_text", "review_img_urls", "review_img_url", "review_photo_ids", "owner_answer", "owner_answer_timestamp", "owner_answer_timestamp_datetime_utc", "review_link", "review_rating", "review_timestamp", "review_datetime_utc", "months", "year", "month_year", "review_likes", "reviews_id", "reviews_per_score_1", "reviews_per_score_2", "reviews_per_score_3", "reviews_per_score_4", "reviews_per_score_5", "review_questions_Service", "review_questions_Meal type", "review_questions_Food", "review_questions_Atmosphere", "review_questions_Price per person", "review_questions_Recommended dishes", "review_questions", "review_questions_Noise level", "review_questions_Wait time", "review_questions_Group size", "review_questions_Special offers", "review_questions_Parking space", "review_questions_Parking options", "review_questions_None", "review_questions_Dietary restrictions", "review_questions_Vegetarian options", "review_questions_Parking", "review_questions_Kid-friendliness", "review_questions_Wheelchair accessibility", "review_questions_Reservation", "review_questions_Seating type"]
+
+# Every field after review_likes is reserved in the schema but never filled from SerpApi
+EMPTY_TAIL = ("",) * (len(FIELDNAMES) - FIELDNAMES.index("review_likes") - 1)
+
+def clean_text(text: str) -> str:
+    """Clean text by replacing newlines/tabs with spaces and normalizing whitespace"""
+    if not text:
+        return ""
+    return " ".join(text.replace("\r\n", " ").replace("\r", " ").replace("\n", " ").replace("\t", " ").split())
+
+def parse_iso_date(iso_date: str) -> Optional[datetime]:
+    """Parse a SerpApi iso_date ("...Z"), None if missing or malformed"""
+    if not iso_date:
+        return None
+    try:
+        return datetime.fromisoformat(iso_date.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+class ReviewTransform:
+    """Turn raw SerpApi reviews into schema rows, filtering by date before a row is built
+
+    The date window is parsed once, each iso_date is parsed once and shared between
+    filtering and formatting, and rows are plain tuples in FIELDNAMES order.
+    """
+    
+    def __init__(self, place_id: Optional[str] = None, start_date: Optional[str] = None, end_date: Optional[str] = None):
+        self.place_id = place_id
+        self.start_dt = datetime.strptime(start_date, "%Y-%m-%d") if start_date else None
+        self.end_dt = datetime.strptime(end_date, "%Y-%m-%d") if end_date else None
+        self.filtering = self.start_dt is not None or self.end_dt is not None
+        # Oldest review date on the last page, for the PagingPlanner
+        self.page_oldest = None
+    
+    def rows(self, page_reviews: List[Dict]) -> List[Tuple]:
+        """Filter and format one page of raw reviews"""
+        return self.build_rows(self.filter(page_reviews))
+    
+    def filter(self, page_reviews: List[Dict]) -> List[Tuple[Dict, Optional[datetime]]]:
+        """Keep the reviews inside the date window, paired with their parsed date"""
+        kept = []
+        oldest = None
+        start_dt = self.start_dt
+        end_dt = self.end_dt
+        for review in page_reviews:
+            review_date = parse_iso_date(review.get("iso_date", ""))
+            if review_date is not None:
+                naive_date = review_date.replace(tzinfo=None)
+                if oldest is None or naive_date < oldest:
+                    oldest = naive_date
+            
+            if self.filtering:
+                if review_date is None:
+                    continue
+                if start_dt and naive_date < start_dt:
+                    continue
+                if end_dt and naive_date > end_dt:
+                    continue
+            
+            kept.append((review, review_date))
+        
+        self.page_oldest = oldest
+        return kept
+    
+    def build_rows(self, dated_reviews: List[Tuple[Dict, Optional[datetime]]]) -> List[Tuple]:
+        """Format filtered (review, date) pairs into schema rows"""
+        build_row = self.build_row
+        return [build_row(review, review_date) for review, review_date in dated_reviews]
+    
+    def build_row(self, review: Dict, review_date: Optional[datetime]) -> Tuple:
+        """Build one schema row from a raw review and its parsed date"""
+        images = review.get("images", [])
+        image_urls = images if isinstance(images, list) else []
+        owner_answer = review.get("owner_answer") or {}
+        owner_time = owner_answer.get("time", "")
+        user = review.get("user", {})
+        rating = review.get("rating")
+        
+        return (
+            "", "", "", self.place_id, "", "", "",
+            rating,
+            review.get("review_id", ""),
+            "",
+            user.get("link", ""),
+            user.get("name", ""),
+            user.get("contributor_id", ""),
+            user.get("thumbnail", ""),
+            user.get("reviews", ""),
+            "",
+            clean_text(review.get("snippet", "")),
+            "|".join(image_urls),
+            image_urls[0] if image_urls else "",
+            "",
+            clean_text(owner_answer.get("answer", "")),
+            owner_time,
+            datetime.fromtimestamp(owner_time).isoformat() if owner_time else "",
+            review.get("link", ""),
+            rating,
+            review.get("iso_date", ""),
+            review_date.isoformat() if review_date else "",
+            "",
+            review_date.year if review_date else "",
+            f"{review_date.year:04d}-{review_date.month:02d}" if review_date else "",
+            review.get("likes", ""),
+        ) + EMPTY_TAIL
+
+def rows_from_dicts(reviews: List[Dict]) -> List[Tuple]:
+    """Convert format_review style dicts to schema rows"""
+    return [tuple(review.get(name, "") for name in FIELDNAMES) for review in reviews]
+
+class ReviewSink:
+    """Destination for formatted review rows, written one page at a time"""
+    
+    def write(self, rows: List[Tuple]) -> bool:
+        """Write a page of rows (tuples in FIELDNAMES order), returns True when everything written so far is on disk"""
+        raise NotImplementedError
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class CsvSink(ReviewSink):
+    """Append rows to the 58-column CSV through one long-lived, buffered file handle
+
+    flush_every=1 flushes after every page (the README's per-page guarantee); fsync=True
+    also forces each flush to disk. The file is only created once there is a row to write.
+    """
+    
+    def __init__(self, filename: str, flush_every: int = 1, fsync: bool = False, buffer_size: int = 1 << 16):
+        self.filename = filename
+        self.flush_every = max(flush_every, 1)
+        self.fsync = fsync
+        self.buffer_size = buffer_size
+        self.file = None
+        self.writer = None
+        self.pages_since_flush = 0
+    
+    def open(self):
+        new_file = not os.path.exists(self.filename) or os.path.getsize(self.filename) == 0
+        self.file = open(self.filename, mode="a", newline="", encoding="utf-8", buffering=self.buffer_size)
+        self.writer = csv.writer(self.file)
+        if new_file:
+            self.writer.writerow(FIELDNAMES)
+    
+    def write(self, rows: List[Tuple]) -> bool:
+        if rows:
+            if self.file is None:
+                self.open()
+            self.writer.writerows(rows)
+        
+        self.pages_since_flush += 1
+        if self.pages_since_flush >= self.flush_every:
+            self.flush()
+            return True
+        return False
+    
+    def flush(self):
+        self.pages_since_flush = 0
+        if self.file is None:
+            return
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+    
+    def close(self):
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+class ParquetSink(ReviewSink):
+    """Typed, dictionary-encoded Parquet output written in row groups (needs pyarrow)"""
+    
+    # Columns that get a real type; everything else is a (dictionary-encoded) string
+    INT_COLUMNS = {"rating": 8, "review_rating": 8, "author_reviews_count": 32, "year": 16, "review_likes": 32, "owner_answer_timestamp": 64}
+    UTC_COLUMNS = {"review_timestamp", "review_datetime_utc"}
+    # The transform builds this one from a local fromtimestamp, so it has no timezone
+    NAIVE_COLUMNS = {"owner_answer_timestamp_datetime_utc"}
+    
+    def __init__(self, filename: str, row_group_size: int = 10000, compression: str = "zstd"):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output needs pyarrow: pip install pyarrow")
+        
+        self.pa = pa
+        fields = []
+        for name in FIELDNAMES:
+            if name in self.INT_COLUMNS:
+                fields.append(pa.field(name, getattr(pa, f"int{self.INT_COLUMNS[name]}")()))
+            elif name in self.UTC_COLUMNS:
+                fields.append(pa.field(name, pa.timestamp("us", tz="UTC")))
+            elif name in self.NAIVE_COLUMNS:
+                fields.append(pa.field(name, pa.timestamp("us")))
+            else:
+                fields.append(pa.field(name, pa.string()))
+        self.schema = pa.schema(fields)
+        self.filename = filename
+        self.row_group_size = row_group_size
+        self.buffer = []
+        # Always-empty columns end up as all-null dictionary pages and cost a few bytes each
+        self.writer = pq.ParquetWriter(filename, self.schema, compression=compression, use_dictionary=True)
+    
+    def write(self, rows: List[Tuple]) -> bool:
+        self.buffer.extend(rows)
+        if len(self.buffer) >= self.row_group_size:
+            self.flush()
+        # A Parquet file is only readable once closed
+        return False
+    
+    def flush(self):
+        """Write buffered rows out as one row group"""
+        if not self.buffer:
+            return
+        columns = {name: [self.convert(name, row[index]) for row in self.buffer] for index, name in enumerate(FIELDNAMES)}
+        self.writer.write_table(self.pa.Table.from_pydict(columns, schema=self.schema))
+        self.buffer = []
+    
+    def convert(self, name: str, value):
+        if value == "" or value is None:
+            return None
+        if name in self.INT_COLUMNS:
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                return None
+        if name in self.UTC_COLUMNS or name in self.NAIVE_COLUMNS:
+            try:
+                parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+            except ValueError:
+                return None
+            if name in self.UTC_COLUMNS and parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            return parsed
+        return str(value)
+    
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+def open_sink(filename: str, output_format: Optional[str] = None, flush_every: int = 1, fsync: bool = False) -> ReviewSink:
+    """Open the sink for output_format, or guess it from the file extension (CSV by default)"""
+    output_format = output_format or ("parquet" if filename.endswith(".parquet") else "csv")
+    if output_format == "parquet":
+        return ParquetSink(filename)
+    if output_format == "csv":
+        return CsvSink(filename, flush_every=flush_every, fsync=fsync)
+    raise ValueError(f"Unknown output format: {output_format}")
+
+class RateLimiter:
+    """Thread-safe token bucket shared by every SerpApi call"""
+    
+    def __init__(self, requests_per_second: float = 5.0, burst: int = 5):
+        self.rate = requests_per_second
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self) -> float:
+        """Block until a request may be sent, returns seconds spent waiting"""
+        if not self.rate or self.rate <= 0:
+            return 0.0
+        
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            # Sleep outside the lock so other threads can refill and check too
+            time.sleep(delay)
+            waited += delay
+
+class _NullTimer:
+    """Shared do-nothing context manager handed out when metrics are disabled"""
+    
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NULL_TIMER = _NullTimer()
+
+class _StageTimer:
+    __slots__ = ("metrics", "stage", "start")
+    
+    def __init__(self, metrics: "RunMetrics", stage: str):
+        self.metrics = metrics
+        self.stage = stage
+    
+    def __enter__(self):
+        for hook in self.metrics.hooks:
+            hook.stage_started(self.stage)
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        self.metrics.add_time(self.stage, elapsed)
+        for hook in self.metrics.hooks:
+            hook.stage_finished(self.stage, elapsed)
+        return False
+
+class RunMetrics:
+    """Per-place stage timings and counters for a fetch run
+
+    Stages: rate_limit_wait, retry_sleep, http, json_decode, filter, format, dedupe, sink.
+    Counters: requests, retries, credits (SerpApi searches paid for; cache hits cost none),
+    cache_hits, pages, reviews_fetched, reviews_saved.
+
+    Everything is attributed to the place last set with set_place() on the current thread,
+    so batch workers keep separate numbers. Disabled metrics hand out NULL_TIMER and return early from
+    the counters, which costs one attribute check per call.
+
+    Hooks are objects with stage_started(stage) and stage_finished(stage, seconds), called
+    around every timed stage (see StageProfiler).
+    """
+    
+    STAGES = ("rate_limit_wait", "retry_sleep", "http", "json_decode", "filter", "format", "dedupe", "sink")
+    UNATTRIBUTED = "-"
+    
+    def __init__(self, enabled: bool = True, hooks: Optional[List] = None):
+        self.enabled = enabled
+        self.hooks = hooks or []
+        self.timers = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.started = time.time()
+        self.started_perf = time.perf_counter()
+    
+    def current_place(self) -> str:
+        return getattr(self.local, "place", self.UNATTRIBUTED)
+    
+    def set_place(self, place_key: Optional[str]):
+        """Attribute this thread's timings and counts to place_key from now on"""
+        self.local.place = place_key or self.UNATTRIBUTED
+    
+    def time(self, stage: str):
+        if not self.enabled:
+            return NULL_TIMER
+        return _StageTimer(self, stage)
+    
+    def add_time(self, stage: str, seconds: float):
+        if not self.enabled:
+            return
+        key = (self.current_place(), stage)
+        with self.lock:
+            timer = self.timers.get(key)
+            if timer is None:
+                self.timers[key] = [seconds, 1]
+            else:
+                timer[0] += seconds
+                timer[1] += 1
+    
+    def count(self, name: str, value: int = 1):
+        if not self.enabled:
+            return
+        key = (self.current_place(), name)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+    
+    def summary(self) -> Dict:
+        """Machine-readable run summary: totals plus a breakdown per place"""
+        places = {}
+        totals = {"stages": {}, "counters": {}}
+        with self.lock:
+            for (place, stage), (seconds, calls) in self.timers.items():
+                for bucket in (places.setdefault(place, {"stages": {}, "counters": {}}), totals):
+                    entry = bucket["stages"].setdefault(stage, {"seconds": 0.0, "calls": 0})
+                    entry["seconds"] += seconds
+                    entry["calls"] += calls
+            for (place, name), value in self.counters.items():
+                for bucket in (places.setdefault(place, {"stages": {}, "counters": {}}), totals):
+                    bucket["counters"][name] = bucket["counters"].get(name, 0) + value
+        return {
+            "started_at": datetime.fromtimestamp(self.started, timezone.utc).isoformat(),
+            "elapsed_seconds": round(time.perf_counter() - self.started_perf, 6),
+            "totals": totals,
+            "places": places,
+        }
+    
+    def summary_line(self) -> str:
+        totals = self.summary()["totals"]
+        stages = ", ".join(f"{stage} {totals['stages'][stage]['seconds']:.2f}s" for stage in self.STAGES if stage in totals["stages"])
+        counters = totals["counters"]
+        return f"Timings: {stages or 'none'}. {counters.get('credits', 0)} credits, {counters.get('retries', 0)} retries, {counters.get('cache_hits', 0)} cache hits"
+    
+    def write_json(self, path: str):
+        write_json_atomic(path, self.summary())
+    
+    def write_prometheus(self, path: str):
+        """Write the metrics in the Prometheus text exposition format (e.g. for node_exporter's textfile collector)"""
+        def label(value: str) -> str:
+            return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        
+        summary = self.summary()
+        lines = [
+            "# HELP review_fetcher_run_seconds Wall time of the run",
+            "# TYPE review_fetcher_run_seconds gauge",
+            f"review_fetcher_run_seconds {summary['elapsed_seconds']}",
+            "# HELP review_fetcher_stage_seconds_total Time spent per stage",
+            "# TYPE review_fetcher_stage_seconds_total counter",
+        ]
+        for place, data in sorted(summary["places"].items()):
+            for stage, entry in sorted(data["stages"].items()):
+                lines.append(f'review_fetcher_stage_seconds_total{{place="{label(place)}",stage="{stage}"}} {entry["seconds"]:.6f}')
+        lines += ["# HELP review_fetcher_stage_calls_total Timed calls per stage", "# TYPE review_fetcher_stage_calls_total counter"]
+        for place, data in sorted(summary["places"].items()):
+            for stage, entry in sorted(data["stages"].items()):
+                lines.append(f'review_fetcher_stage_calls_total{{place="{label(place)}",stage="{stage}"}} {entry["calls"]}')
+        names = sorted({name for data in summary["places"].values() for name in data["counters"]})
+        for name in names:
+            lines += [f"# HELP review_fetcher_{name}_total Count of {name.replace('_', ' ')}", f"# TYPE review_fetcher_{name}_total counter"]
+            for place, data in sorted(summary["places"].items()):
+                if name in data["counters"]:
+                    lines.append(f'review_fetcher_{name}_total{{place="{label(place)}"}} {data["counters"][name]}')
+        
+        tmp_path = path + ".tmp"
+        with open(tmp_path, mode="w", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+class StageProfiler:
+    """RunMetrics hook that runs cProfile only inside the chosen stages
+
+    Only one thread is profiled at a time; stages entered by other threads while the
+    profiler is busy are skipped.
+    """
+    
+    def __init__(self, stages: Optional[List[str]] = None):
+        import cProfile
+        self.stages = set(stages) if stages else None
+        self.profiler = cProfile.Profile()
+        self.lock = threading.Lock()
+        self.owner = None
+        self.depth = 0
+    
+    def stage_started(self, stage: str):
+        if self.stages is not None and stage not in self.stages:
+            return
+        me = threading.get_ident()
+        with self.lock:
+            if self.owner is None:
+                self.owner = me
+                self.profiler.enable()
+            elif self.owner != me:
+                return
+            self.depth += 1
+    
+    def stage_finished(self, stage: str, seconds: float):
+        if self.stages is not None and stage not in self.stages:
+            return
+        with self.lock:
+            if self.owner != threading.get_ident():
+                return
+            self.depth -= 1
+            if self.depth == 0:
+                self.profiler.disable()
+                self.owner = None
+    
+    def dump(self, path: str):
+        """Write pstats data, readable with python -m pstats or snakeviz"""
+        self.profiler.dump_stats(path)
+
+class CacheMissError(LookupError):
+    """Raised in offline mode when a request has no cached response"""
+
+class ResponseCache:
+    """SQLite cache of SerpApi responses keyed by the normalized request params (API key excluded)
+
+    Entries expire per engine (place lookups live much longer than review pages) and the
+    least recently used ones are evicted once the cache grows past max_bytes. In offline
+    mode expired entries are still replayed and a miss raises CacheMissError.
+    """
+    
+    DEFAULT_TTLS = {
+        "google_maps": 30 * 24 * 3600,
+        "google_maps_reviews": 12 * 3600,
+    }
+    
+    def __init__(self, path: str = "serpapi_cache.sqlite", ttls: Optional[Dict[str, int]] = None, max_bytes: int = 500 * 1024 * 1024, offline: bool = False):
+        self.path = path
+        self.ttls = dict(self.DEFAULT_TTLS, **(ttls or {}))
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, engine TEXT, created REAL, accessed REAL, size INTEGER, body BLOB)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.db.commit()
+        self.total_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    
+    def key(self, params: Dict) -> str:
+        normalized = {k: str(v) for k, v in params.items() if k != "api_key" and v is not None}
+        return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+    
+    def get(self, params: Dict) -> Optional[Dict]:
+        """Return the cached response, or None if missing or expired"""
+        key = self.key(params)
+        now = time.time()
+        with self.lock:
+            row = self.db.execute("SELECT created, body FROM responses WHERE key = ?", (key,)).fetchone()
+            ttl = self.ttls.get(params.get("engine"), 0)
+            if row is None or (not self.offline and now - row[0] > ttl):
+                self.misses += 1
+                return None
+            self.db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.db.commit()
+            self.hits += 1
+        return json.loads(zlib.decompress(row[1]))
+    
+    def put(self, params: Dict, data: Dict):
+        body = zlib.compress(json.dumps(data).encode("utf-8"))
+        key = self.key(params)
+        now = time.time()
+        with self.lock:
+            old = self.db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)", (key, params.get("engine"), now, now, len(body), body))
+            self.total_bytes += len(body) - (old[0] if old else 0)
+            self.evict()
+            self.db.commit()
+    
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes (lock held)"""
+        while self.total_bytes > self.max_bytes:
+            rows = self.db.execute("SELECT key, size FROM responses ORDER BY accessed LIMIT 100").fetchall()
+            if not rows:
+                self.total_bytes = 0
+                return
+            for key, size in rows:
+                self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.total_bytes -= size
+                if self.total_bytes <= self.max_bytes:
+                    return
+    
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+class PagingPlanner:
+    """Decide when to stop paging, based on the sort order and the date window"""
+    
+    def __init__(self, sort_by: str = "newestFirst", start_date: Optional[str] = None, max_pages: Optional[int] = None, page_size: int = 20):
+        self.sort_by = sort_by
+        self.start_dt = datetime.strptime(start_date, "%Y-%m-%d") if start_date else None
+        self.max_pages = max_pages
+        self.page_size = page_size
+        self.pages_fetched = 0
+        self.reviews_seen = 0
+        self.total_reviews = None
+        self.stopped_early = False
+    
+    def observe(self, data: Dict, oldest: Optional[datetime] = None) -> bool:
+        """Record a fetched page and return False once later pages can't match the window
+
+        oldest is the page's oldest (naive UTC) review date, if the caller already parsed it.
+        """
+        page_reviews = data.get("reviews", [])
+        self.pages_fetched += 1
+        self.reviews_seen += len(page_reviews)
+        
+        if self.total_reviews is None:
+            total = data.get("place_info", {}).get("reviews")
+            if isinstance(total, int):
+                self.total_reviews = total
+        
+        # Only newestFirst guarantees every later page is older than this one
+        if self.sort_by != "newestFirst" or not self.start_dt:
+            return True
+        
+        if oldest is None:
+            dates = [parse_iso_date(review.get("iso_date", "")) for review in page_reviews]
+            dates = [d.replace(tzinfo=None) for d in dates if d is not None]
+            oldest = min(dates) if dates else None
+        
+        if oldest is not None and oldest < self.start_dt:
+            self.stopped_early = True
+            return False
+        return True
+    
+    def pages_saved(self) -> Optional[int]:
+        """Estimate how many pages the early stop skipped (None if the total is unknown)"""
+        if not self.stopped_early:
+            return 0
+        if self.total_reviews is None:
+            return None
+        
+        remaining = max(self.total_reviews - self.reviews_seen, 0)
+        pages = math.ceil(remaining / self.page_size)
+        if self.max_pages:
+            pages = min(pages, max(self.max_pages - self.pages_fetched, 0))
+        return pages
+    
+    def summary(self) -> str:
+        """Human readable report of pages fetched and pages/credits saved"""
+        if not self.stopped_early:
+            return f"Pages fetched: {self.pages_fetched} (no early stop)"
+        
+        saved = self.pages_saved()
+        if saved is None:
+            return f"Pages fetched: {self.pages_fetched}, stopped early (pages saved unknown, place has no review total)"
+        # Each page fetch costs one SerpApi search credit
+        return f"Pages fetched: {self.pages_fetched}, stopped early: saved ~{saved} pages (~{saved} credits)"
+
+def write_json_atomic(path: str, data: Dict):
+    """Write JSON via a temp file + rename, so a crash leaves either the old or the new file"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, mode="w", encoding="utf-8") as file:
+        json.dump(data, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+class CheckpointStore:
+    """Persist harvest progress next to the output file so an interrupted run can resume"""
+    
+    def __init__(self, filename: str):
+        self.path = filename + ".checkpoint.json"
+    
+    def load(self) -> Optional[Dict]:
+        """Return the last committed state, or None if there is none"""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, mode="r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable checkpoint {self.path}: {e}")
+            return None
+    
+    def save(self, state: Dict):
+        write_json_atomic(self.path, state)
+    
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+class SyncStateStore:
+    """Per-place high-water marks: newest review_timestamp and the review_ids stored at it"""
+    
+    def __init__(self, path: str = "review_sync_state.json"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.marks = {}
+        if os.path.exists(path):
+            with open(path, mode="r", encoding="utf-8") as file:
+                self.marks = json.load(file)
+    
+    def get(self, place_key: str) -> Optional[Dict]:
+        with self.lock:
+            return self.marks.get(place_key)
+    
+    def update(self, place_key: str, review_timestamp: str, review_ids: List[str]):
+        """Record a new high-water mark and persist the store"""
+        with self.lock:
+            self.marks[place_key] = {"review_timestamp": review_timestamp, "review_ids": sorted(set(review_ids))}
+            write_json_atomic(self.path, self.marks)
+    
+    @staticmethod
+    def mark_from_csv(filename: str, place_key: str) -> Optional[Dict]:
+        """Rebuild place_key's mark from its newest review_timestamp in a CSV, None if the file has no dated rows for it
+
+        Only rows whose place_id is place_key count: several places can share one output file.
+        """
+        newest_timestamp = ""
+        newest_ids = set()
+        with open(filename, mode="r", newline="", encoding="utf-8") as file:
+            for row in csv.DictReader(file):
+                if row.get("place_id") != place_key:
+                    continue
+                timestamp = row.get("review_timestamp") or ""
+                if timestamp > newest_timestamp:
+                    newest_timestamp = timestamp
+                    newest_ids = set()
+                if timestamp and timestamp == newest_timestamp:
+                    newest_ids.add(row.get("review_id") or "")
+        if not newest_timestamp:
+            return None
+        return {"review_timestamp": newest_timestamp, "review_ids": sorted(newest_ids)}
+
+class ReviewIndex:
+    """Persistent review_id -> content hash index, used to skip reviews already written
+
+    Lookups go to an in-memory dict (O(1) at millions of ids). The on-disk store is an
+    append-only "review_id<TAB>hash" log that loads with one sequential read and is
+    compacted on load once superseded lines pile up. A known id whose content hash
+    changed (edited text, rating or owner answer) counts as an update, not a duplicate:
+    its new row replaces the old one in the output (see replace_updated_rows).
+    """
+    
+    REVIEW_ID = FIELDNAMES.index("review_id")
+    HASHED_FIELDS = [FIELDNAMES.index(name) for name in ("rating", "review_text", "review_img_urls", "owner_answer", "owner_answer_timestamp")]
+    
+    def __init__(self, path: str = "review_index.tsv"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.hashes = {}
+        self.duplicates = 0
+        self.updates = 0
+        lines = 0
+        if os.path.exists(path):
+            with open(path, mode="r", encoding="utf-8") as file:
+                for line in file:
+                    review_id, _, content_hash = line.rstrip("\n").partition("\t")
+                    if content_hash:
+                        self.hashes[review_id] = int(content_hash, 16)
+                        lines += 1
+        if lines > 2 * len(self.hashes) + 1000:
+            self.compact()
+        self.file = open(path, mode="a", encoding="utf-8")
+    
+    def content_hash(self, row: Tuple) -> int:
+        content = "\x1f".join(str(row[index]) for index in self.HASHED_FIELDS)
+        return int.from_bytes(hashlib.blake2b(content.encode("utf-8"), digest_size=8).digest(), "big")
+    
+    def filter(self, rows: List[Tuple], write_updates: bool = True, updated: Optional[Dict[str, Tuple]] = None) -> Tuple[List[Tuple], List[Tuple[str, int]]]:
+        """Drop rows already indexed with the same content
+
+        Returns the rows to write and the index entries to commit() once they are on disk.
+        If updated is given, it receives review_id -> new row for every update kept.
+        """
+        keep = []
+        pending = []
+        with self.lock:
+            for row in rows:
+                review_id = row[self.REVIEW_ID]
+                if not review_id:
+                    keep.append(row)
+                    continue
+                content_hash = self.content_hash(row)
+                known = self.hashes.get(review_id)
+                if known == content_hash:
+                    self.duplicates += 1
+                    continue
+                if known is not None:
+                    self.updates += 1
+                    if not write_updates:
+                        continue
+                    if updated is not None:
+                        updated[review_id] = row
+                self.hashes[review_id] = content_hash
+                pending.append((review_id, content_hash))
+                keep.append(row)
+        return keep, pending
+    
+    def commit(self, pending: List[Tuple[str, int]]):
+        """Persist index entries for rows that have been written"""
+        if not pending:
+            return
+        with self.lock:
+            self.file.write("".join(f"{review_id}\t{content_hash:016x}\n" for review_id, content_hash in pending))
+            self.file.flush()
+    
+    def compact(self):
+        """Rewrite the log with one line per review_id"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, mode="w", encoding="utf-8") as file:
+            for review_id, content_hash in self.hashes.items():
+                file.write(f"{review_id}\t{content_hash:016x}\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
+    
+    def summary(self) -> str:
+        return f"Dedupe index: {len(self.hashes)} reviews known, {self.duplicates} duplicates skipped, {self.updates} updates"
+    
+    def close(self):
+        with self.lock:
+            self.file.close()
+
 class SerpApiReviewFetcher:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, base_url: str = "https://serpapi.com/search", rate_limiter: Optional[RateLimiter] = None, pool_size: int = 10, connect_timeout: float = 10, read_timeout: float = 30, cache: Optional[ResponseCache] = None, metrics: Optional[RunMetrics] = None):
         self.api_key = api_key
-        self.base_url = "https://serpapi.com/search"
+        self.base_url = base_url
+        self.cache = cache
+        self.metrics = metrics or RunMetrics(enabled=False)
+        # Pass the same RateLimiter to several fetchers to share one request budget
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.timeout = (connect_timeout, read_timeout)
+        
+        # One keep-alive session for every call, so pages reuse the TCP/TLS connection
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Accept-Encoding": ACCEPT_ENCODING, "Connection": "keep-alive"})
+    
+    def close(self):
+        """Close the pooled HTTP connections and the response cache"""
+        self.session.close()
+        if self.cache:
+            self.cache.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
     
     def extract_place_id_from_url(self, url: str) -> Optional[str]:
         """Extract place_id or data_id (CID) from Google Maps URL"""
@@ -46,8 +880,7 @@ class SerpApiReviewFetcher:
         }
         
         try:
-            response = requests.get(self.base_url, params=params)
-            data = response.json()
+            data = self.request_json(params)
             
             if "local_results" in data and data["local_results"]:
                 return data["local_results"][0].get("place_id")
@@ -58,65 +891,130 @@ class SerpApiReviewFetcher:
         
         return None
     
-    def fetch_reviews_page(self, place_id: Optional[str], next_page_token: Optional[str] = None, num: int = 20, retries: int = 3) -> Dict:
-        """Fetch a single page of reviews by place_id with retry logic"""
-        params = {
-            "engine": "google_maps_reviews",
-            "place_id": place_id,
-            "api_key": self.api_key
-        }
-        
-        if next_page_token:
-            params["next_page_token"] = next_page_token
-            params["num"] = str(num)
+    def request_json(self, params: Dict, retries: int = 3) -> Dict:
+        """Send a rate limited SerpApi request with retry logic and return the JSON body
+
+        With a cache, a fresh cached response is returned without touching the network.
+        """
+        metrics = self.metrics
+        if self.cache:
+            cached = self.cache.get(params)
+            if cached is not None:
+                metrics.count("cache_hits")
+                return cached
+            if self.cache.offline:
+                raise CacheMissError(f"No cached response for {params.get('engine')} request (offline mode)")
         
         for attempt in range(retries):
+            metrics.add_time("rate_limit_wait", self.rate_limiter.acquire())
+            metrics.count("requests")
             try:
-                time.sleep(1)
-                response = requests.get(self.base_url, params=params, timeout=30)
-                response.raise_for_status()
-                return response.json()
+                with metrics.time("http"):
+                    response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+                    response.raise_for_status()
+                with metrics.time("json_decode"):
+                    data = response.json()
+                # One credit per search; SerpApi doesn't charge for searches that come back with an error
+                if "error" not in data:
+                    metrics.count("credits")
+                # SerpApi reports some failures as an "error" field, don't replay those
+                if self.cache and "error" not in data:
+                    self.cache.put(params, data)
+                return data
             except Exception as e:
                 if attempt < retries - 1:
-                    wait_time = (attempt +1) * 2
-                    print(f"Error: {e}. Retrying in {wait_time}s... (attempt {attempt + 1}/{retries})")
+                    wait_time = self.retry_delay(attempt, getattr(e, "response", None))
+                    print(f"Error: {e}. Retrying in {wait_time:.1f}s... (attempt {attempt + 1}/{retries})")
+                    metrics.count("retries")
                     time.sleep(wait_time)
+                    metrics.add_time("retry_sleep", wait_time)
                 else:
                     raise
         
         raise Exception(f"Failed to fetch page after {retries} attempts")
     
-    def fetch_reviews_page_by_data_id(self, data_id: str, next_page_token: Optional[str] = None, num: int = 20, retries: int = 3) -> Dict:
-        """Fetch a single page of reviews by data_id (CID) with retry logic"""
+    def retry_delay(self, attempt: int, response: Optional[requests.Response] = None, base: float = 2.0, cap: float = 60.0) -> float:
+        """Seconds to wait before a retry: Retry-After if the server sent one, else jittered exponential"""
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(max(float(retry_after), 0.0), cap)
+            except ValueError:
+                try:
+                    retry_at = parsedate_to_datetime(retry_after)
+                    return min(max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0), cap)
+                except (TypeError, ValueError):
+                    pass
+        
+        delay = min(cap, base * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+    
+    def resolve_ids(self, input_str: str) -> Tuple[Optional[str], Optional[str]]:
+        """Resolve a Place ID, Google Maps URL or place name to (place_id, data_id)"""
+        if "google.com/maps" in input_str or "goo.gl/maps" in input_str:
+            return None, self.extract_place_id_from_url(input_str)
+        if not input_str.startswith("ChIJ"):
+            return self.get_place_id_from_name(input_str), None
+        return input_str, None
+    
+    def fetch_reviews_page(self, place_id: Optional[str] = None, next_page_token: Optional[str] = None, num: int = 20, retries: int = 3, sort_by: Optional[str] = None, data_id: Optional[str] = None) -> Dict:
+        """Fetch a single page of reviews by place_id, or by data_id (CID) if given, with retry logic"""
         params = {
             "engine": "google_maps_reviews",
-            "data_id": data_id,
             "api_key": self.api_key
         }
         
+        if data_id:
+            params["data_id"] = data_id
+        else:
+            params["place_id"] = place_id
+        
+        if sort_by:
+            params["sort_by"] = sort_by
+        
         if next_page_token:
             params["next_page_token"] = next_page_token
             params["num"] = str(num)
         
-        for attempt in range(retries):
-            try:
-                time.sleep(1)
-                response = requests.get(self.base_url, params=params, timeout=30)
-                response.raise_for_status()
-                return response.json()
-            except Exception as e:
-                if attempt < retries - 1:
-                    wait_time = (attempt +1) * 2
-                    print(f"Error: {e}. Retrying in {wait_time}s... (attempt {attempt + 1}/{retries})")
-                    time.sleep(wait_time)
-                else:
-                    raise
-        
-        raise Exception(f"Failed to fetch page after {retries} attempts")
+        return self.request_json(params, retries)
+    
+    def fetch_reviews_page_by_data_id(self, data_id: str, next_page_token: Optional[str] = None, num: int = 20, retries: int = 3, sort_by: Optional[str] = None) -> Dict:
+        """Fetch a single page of reviews by data_id (CID) with retry logic"""
+        return self.fetch_reviews_page(next_page_token=next_page_token, num=num, retries=retries, sort_by=sort_by, data_id=data_id)
+    
+    def iter_review_pages(self, place_id: Optional[str] = None, data_id: Optional[str] = None, sort_by: Optional[str] = None, next_page_token: Optional[str] = None, start_page: int = 0, max_pages: Optional[int] = None) -> Iterator[Dict]:
+        """Yield review pages one at a time along the next_page_token chain
+
+        Stops at the last page, at a page without reviews or at max_pages; the next page
+        is only requested once the caller asks for it.
+        """
+        page = start_page
+        while True:
+            if max_pages and page >= max_pages:
+                print(f"Reached max pages limit: {max_pages}")
+                return
+            
+            print(f"Fetching page {page + 1}...", end=" ")
+            data = self.fetch_reviews_page(place_id, next_page_token, sort_by=sort_by, data_id=data_id)
+            
+            if "reviews" not in data:
+                print("No reviews found")
+                return
+            
+            yield data
+            
+            next_page_token = data.get("serpapi_pagination", {}).get("next_page_token")
+            if not next_page_token:
+                print("No more pages")
+                return
+            page += 1
     
-    def fetch_all_reviews(self, place_id: Optional[str] = None, data_id: Optional[str] = None, sort_by: str = "newestFirst", max_pages: Optional[int] = None, filename: str = "reviews.csv", start_date: Optional[str] = None, end_date: Optional[str] = None) -> int:
-        """Fetch all reviews with pagination, save incrementally, and filter by date"""
-        all_reviews = []
+    def fetch_all_reviews(self, place_id: Optional[str] = None, data_id: Optional[str] = None, sort_by: str = "newestFirst", max_pages: Optional[int] = None, filename: str = "reviews.csv", start_date: Optional[str] = None, end_date: Optional[str] = None, resume: bool = False, output_format: Optional[str] = None, flush_every: int = 1, fsync: bool = False, dedupe_index: Optional[ReviewIndex] = None, analytics=None) -> int:
+        """Fetch all reviews with pagination, save incrementally, and filter by date
+
+        analytics is an optional analytics.ReviewAggregator fed with every saved page.
+        """
+        planner = PagingPlanner(sort_by, start_date, max_pages)
         next_page_token = None
         page = 0
         total_saved = 0
@@ -124,6 +1022,9 @@ class SerpApiReviewFetcher:
         # Use data_id if available (more accurate), otherwise use place_id
         use_data_id = data_id is not None
         used_id = data_id if use_data_id else place_id
+        transform = ReviewTransform(used_id, start_date, end_date)
+        metrics = self.metrics
+        metrics.set_place(used_id)
         
         print(f"Fetching reviews (sort: {sort_by})...")
         if start_date:
@@ -135,141 +1036,318 @@ class SerpApiReviewFetcher:
         else:
             print(f"Using place_id: {place_id}")
         
-        # Clear existing file for this run
-        if os.path.exists(filename):
-            print(f"Removing old data from {filename}")
-            os.remove(filename)
+        output_format = output_format or ("parquet" if filename.endswith(".parquet") else "csv")
+        if dedupe_index and output_format != "csv":
+            raise ValueError("The dedupe index is only supported for CSV output")
+        # Only CSV can be truncated back to a checkpoint, so only CSV runs are resumable
+        resumable = output_format == "csv"
+        checkpoint = CheckpointStore(filename)
+        run_key = {"id": used_id, "sort_by": sort_by, "start_date": start_date, "end_date": end_date}
+        state = checkpoint.load() if resume and resumable else None
+        if resume and not resumable:
+            print("Resume is only supported for CSV output, starting over")
         
-        while True:
-            if max_pages and page >= max_pages:
-                print(f"Reached max pages limit: {max_pages}")
-                break
-            
-            print(f"Fetching page {page + 1}...", end=" ")
-            
-            if use_data_id:
-                data = self.fetch_reviews_page_by_data_id(data_id, next_page_token)
-            else:
-                data = self.fetch_reviews_page(place_id, next_page_token)
-            
-            if "reviews" not in data:
-                print("No reviews found")
-                break            
-            page_reviews = data["reviews"]
-            
-            # Filter by date BEFORE saving
-            formatted_reviews = [self.format_review(r, used_id) for r in page_reviews]
-            if start_date or end_date:
-                formatted_reviews = self.filter_by_date(formatted_reviews, start_date, end_date)
-            
-            # Keep fetching if there's a next page, even if this page has no matches
-            # Don't break - we might find reviews on the next page
-            if not formatted_reviews:
-                print(f"No reviews in date range on this page")
-            
-            all_reviews.extend(page_reviews)
-            print(f"Got {len(page_reviews)} reviews")
-            if start_date or end_date:
-                print(f"After date filter: {len(formatted_reviews)} reviews")
-            
-            # Save immediately
-            self.append_to_csv(formatted_reviews, filename)
-            total_saved += len(formatted_reviews)
-            
-            next_page_token = data.get("serpapi_pagination", {}).get("next_page_token")
-            if not next_page_token:
-                print("No more pages")
-                break
-            
-            page += 1
+        if state and state.get("run") != run_key:
+            print(f"Checkpoint in {checkpoint.path} is for a different run, starting over")
+            state = None
+        
+        if state:
+            next_page_token = state["next_page_token"]
+            page = state["page"]
+            total_saved = state["rows_written"]
+            # Drop anything appended after the last checkpoint (torn or uncommitted page)
+            if os.path.exists(filename) and os.path.getsize(filename) > state["file_size"]:
+                with open(filename, mode="r+b") as file:
+                    file.truncate(state["file_size"])
+            print(f"Resuming from page {page + 1} ({total_saved} reviews already saved)")
+        elif dedupe_index and os.path.exists(filename):
+            # The index already knows the rows in this file, so they must stay: append to it
+            print(f"Appending to {filename}, skipping reviews already in the dedupe index")
+            checkpoint.clear()
+        else:
+            # Clear existing file for this run
+            if os.path.exists(filename):
+                print(f"Removing old data from {filename}")
+                os.remove(filename)
+            checkpoint.clear()
+        
+        more_pages = True
+        pending = []
+        updated = {}
+        with open_sink(filename, output_format, flush_every=flush_every, fsync=fsync) as sink:
+            # Only the current page is held in memory: fetch -> filter/transform -> sink
+            for data in self.iter_review_pages(place_id, data_id, sort_by, next_page_token, page, max_pages):
+                page_reviews = data["reviews"]
+                metrics.count("pages")
+                metrics.count("reviews_fetched", len(page_reviews))
+                
+                # Filter by date BEFORE building rows
+                with metrics.time("filter"):
+                    dated_reviews = transform.filter(page_reviews)
+                with metrics.time("format"):
+                    formatted_reviews = transform.build_rows(dated_reviews)
+                
+                # An empty page isn't a reason to stop by itself - the planner decides
+                # based on sort order whether later pages can still match
+                if not formatted_reviews:
+                    print(f"No reviews in date range on this page")
+                
+                print(f"Got {len(page_reviews)} reviews")
+                if start_date or end_date:
+                    print(f"After date filter: {len(formatted_reviews)} reviews")
+                
+                if dedupe_index:
+                    with metrics.time("dedupe"):
+                        formatted_reviews, page_pending = dedupe_index.filter(formatted_reviews, updated=updated)
+                    pending.extend(page_pending)
+                
+                # Save immediately; the checkpoint only advances once the rows are flushed
+                with metrics.time("sink"):
+                    durable = sink.write(formatted_reviews)
+                if formatted_reviews:
+                    print(f"Saved {len(formatted_reviews)} reviews to {filename}")
+                total_saved += len(formatted_reviews)
+                metrics.count("reviews_saved", len(formatted_reviews))
+                if analytics:
+                    analytics.add_rows(formatted_reviews)
+                
+                if not planner.observe(data, transform.page_oldest):
+                    print(f"Reviews are now older than {start_date}, stopping early")
+                    more_pages = False
+                    break
+                
+                page += 1
+                next_page_token = data.get("serpapi_pagination", {}).get("next_page_token")
+                more_pages = bool(next_page_token)
+                if more_pages and resumable and durable:
+                    checkpoint.save({
+                        "run": run_key,
+                        "next_page_token": next_page_token,
+                        "page": page,
+                        "rows_written": total_saved,
+                        "file_size": os.path.getsize(filename) if os.path.exists(filename) else 0,
+                    })
+                # Index entries go in only after their rows are on disk (and checkpointed)
+                if durable and dedupe_index:
+                    dedupe_index.commit(pending)
+                    pending = []
+        
+        if dedupe_index:
+            dedupe_index.commit(pending)
+            print(dedupe_index.summary())
+        if updated:
+            self.replace_updated_rows(filename, updated)
+        
+        # Keep the checkpoint only if max_pages cut the run short, so it can be extended later
+        if not (more_pages and max_pages and page >= max_pages):
+            checkpoint.clear()
         
         print(f"\nTotal reviews fetched and saved: {total_saved}")
+        print(planner.summary())
         return total_saved
     
-    def clean_text(self, text: str) -> str:
-        """Clean text by replacing newlines/tabs with spaces and normalizing whitespace"""
-        if not text:
-            return ""
-        return " ".join(text.replace("\r\n", " ").replace("\r", " ").replace("\n", " ").replace("\t", " ").split())
+    def sync_reviews(self, place_id: Optional[str] = None, data_id: Optional[str] = None, filename: str = "reviews.csv", state_store: Optional[SyncStateStore] = None, dedupe_index: Optional[ReviewIndex] = None, analytics=None) -> int:
+        """Fetch only reviews newer than the place's high-water mark and merge them into filename"""
+        state_store = state_store or SyncStateStore()
+        use_data_id = data_id is not None
+        used_id = data_id if use_data_id else place_id
+        
+        mark = None
+        if os.path.exists(filename):
+            # A file harvested before --incremental was used has no mark yet: start from its newest review
+            mark = state_store.get(used_id) or SyncStateStore.mark_from_csv(filename, used_id)
+        mark_timestamp = mark["review_timestamp"] if mark else ""
+        known_ids = set(mark["review_ids"]) if mark else set()
+        if mark:
+            print(f"Syncing reviews newer than {mark_timestamp} for {used_id}")
+        else:
+            print(f"No stored reviews for {used_id}, fetching full history")
+        
+        transform = ReviewTransform(used_id)
+        metrics = self.metrics
+        metrics.set_place(used_id)
+        new_filename = filename + ".new"
+        if os.path.exists(new_filename):
+            os.remove(new_filename)
+        
+        total_new = 0
+        pending = []
+        updated = {}
+        newest_timestamp = mark_timestamp
+        newest_ids = set(known_ids)
+        
+        # No max_pages here: stopping before the mark would leave a gap behind the new mark
+        with CsvSink(new_filename) as sink:
+            for data in self.iter_review_pages(place_id, data_id, "newestFirst"):
+                metrics.count("pages")
+                metrics.count("reviews_fetched", len(data["reviews"]))
+                fresh = []
+                reached_mark = False
+                with metrics.time("filter"):
+                    for review in data["reviews"]:
+                        # iso_date strings share one format, so they compare chronologically
+                        timestamp = review.get("iso_date", "")
+                        if review.get("review_id") in known_ids or (mark_timestamp and timestamp and timestamp < mark_timestamp):
+                            reached_mark = True
+                            continue
+                        fresh.append(review)
+                        if timestamp > newest_timestamp:
+                            newest_timestamp = timestamp
+                            newest_ids = set()
+                        if timestamp == newest_timestamp:
+                            newest_ids.add(review.get("review_id", ""))
+                
+                with metrics.time("format"):
+                    rows = transform.rows(fresh)
+                if dedupe_index:
+                    with metrics.time("dedupe"):
+                        rows, page_pending = dedupe_index.filter(rows, updated=updated)
+                    pending.extend(page_pending)
+                print(f"Got {len(rows)} new reviews")
+                with metrics.time("sink"):
+                    sink.write(rows)
+                total_new += len(rows)
+                metrics.count("reviews_saved", len(rows))
+                if analytics:
+                    analytics.add_rows(rows)
+                
+                # newestFirst: everything past a stored review is already stored
+                if reached_mark:
+                    break
+        
+        if total_new:
+            self.merge_new_reviews(new_filename, filename)
+        if updated:
+            self.replace_updated_rows(filename, updated)
+        if dedupe_index:
+            dedupe_index.commit(pending)
+        # Only advance the mark once the rows are safely merged
+        if newest_timestamp:
+            state_store.update(used_id, newest_timestamp, list(newest_ids))
+        
+        print(f"\nNew reviews merged into {filename}: {total_new}")
+        return total_new
     
-    def format_review(self, review: Dict, place_id: Optional[str] = None) -> Dict:
-        """Format review to match CSV schema"""
-        iso_date = review.get("iso_date", "")
-        review_date = None
+    def merge_new_reviews(self, new_filename: str, filename: str):
+        """Put newly fetched rows ahead of the existing ones (newest first) and replace filename atomically"""
+        if not os.path.exists(filename):
+            os.replace(new_filename, filename)
+            return
         
-        if iso_date:
-            try:
-                review_date = datetime.fromisoformat(iso_date.replace("Z", "+00:00"))
-            except:
-                pass
+        tmp_filename = filename + ".tmp"
+        with open(tmp_filename, mode="w", newline="", encoding="utf-8") as out:
+            with open(new_filename, mode="r", newline="", encoding="utf-8") as new:
+                shutil.copyfileobj(new, out)
+            with open(filename, mode="r", newline="", encoding="utf-8") as old:
+                old.readline()
+                shutil.copyfileobj(old, out)
+        os.replace(tmp_filename, filename)
+        os.remove(new_filename)
+    
+    def replace_updated_rows(self, filename: str, updated: Dict[str, Tuple]):
+        """Keep one row per updated review_id: its new version, where the review first appears in filename"""
+        review_id_index = FIELDNAMES.index("review_id")
+        written = set()
+        tmp_filename = filename + ".tmp"
+        with open(filename, mode="r", newline="", encoding="utf-8") as old, open(tmp_filename, mode="w", newline="", encoding="utf-8") as out:
+            reader = csv.reader(old)
+            writer = csv.writer(out)
+            for row in reader:
+                review_id = row[review_id_index] if len(row) > review_id_index else ""
+                if review_id in updated:
+                    if review_id in written:
+                        continue
+                    written.add(review_id)
+                    row = updated[review_id]
+                writer.writerow(row)
+        os.replace(tmp_filename, filename)
+        print(f"Replaced {len(written)} updated reviews in {filename}")
+    
+    def fetch_batch(self, places: List[Dict], output_dir: str = "reviews", max_workers: int = 4, merged_filename: Optional[str] = None, sort_by: str = "newestFirst", max_pages: Optional[int] = None, start_date: Optional[str] = None, end_date: Optional[str] = None, resume: bool = False, state_store: Optional[SyncStateStore] = None, output_format: str = "csv", flush_every: int = 1, fsync: bool = False, dedupe_index: Optional[ReviewIndex] = None, analytics=None) -> Dict[str, Dict]:
+        """Fetch reviews for many places concurrently, one CSV per place (optionally merged)
+
+        With a state_store each place is synced incrementally instead of refetched in full.
+        """
+        if state_store and output_format != "csv":
+            raise ValueError("Incremental sync is only supported for CSV output")
+        os.makedirs(output_dir, exist_ok=True)
         
-        images = review.get("images", [])
-        image_urls = images if isinstance(images, list) else []
+        def harvest(index: int, entry: Dict) -> Tuple[str, Dict]:
+            label = entry.get("label") or entry.get("data_id") or entry.get("place_id") or entry.get("url") or entry.get("name") or f"place_{index}"
+            # Place lookups count towards this entry until fetch_all_reviews/sync_reviews switch to the resolved id
+            self.metrics.set_place(label)
+            try:
+                place_id = entry.get("place_id") or None
+                data_id = entry.get("data_id") or None
+                if not place_id and not data_id:
+                    place_id, data_id = self.resolve_ids(entry.get("url") or entry.get("name") or "")
+                if not place_id and not data_id:
+                    return label, {"error": "Could not find Place ID or data_id"}
+                label = entry.get("label") or data_id or place_id
+                
+                # Stable per-place names, so resume and incremental sync find the same file
+                filename = os.path.join(output_dir, f"{re.sub(r'[^A-Za-z0-9_.-]', '_', label)[:80]}.{output_format}")
+                # Each place pages through its own next_page_token chain sequentially
+                if state_store:
+                    saved = self.sync_reviews(place_id=place_id, data_id=data_id, filename=filename, state_store=state_store, dedupe_index=dedupe_index, analytics=analytics)
+                    return label, {"saved": saved, "filename": filename}
+                saved = self.fetch_all_reviews(
+                    place_id=place_id,
+                    data_id=data_id,
+                    sort_by=sort_by,
+                    max_pages=int(entry["max_pages"]) if entry.get("max_pages") else max_pages,
+                    filename=filename,
+                    start_date=entry.get("start_date") or start_date,
+                    end_date=entry.get("end_date") or end_date,
+                    resume=resume,
+                    output_format=output_format,
+                    flush_every=flush_every,
+                    fsync=fsync,
+                    dedupe_index=dedupe_index,
+                    analytics=analytics,
+                )
+                return label, {"saved": saved, "filename": filename}
+            except Exception as e:
+                print(f"Error fetching {label}: {e}")
+                return label, {"error": str(e)}
         
-        owner_answer = review.get("owner_answer", {})
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(harvest, range(len(places)), places))
         
-        user = review.get("user", {})
+        if merged_filename and output_format != "csv":
+            print("Merging is only supported for CSV output, keeping per-place files")
+        elif merged_filename:
+            self.merge_csv_files([r["filename"] for _, r in results if r.get("filename")], merged_filename)
         
-        return {
-            "query": "",
-            "name": "",
-            "google_id": "",
-            "place_id": place_id,
-            "location_link": "",
-            "reviews_link": "",
-            "reviews": "",
-            "rating": review.get("rating"),
-            "review_id": review.get("review_id", ""),
-            "review_pagination_id": "",
-            "author_link": user.get("link", ""),
-            "author_title": user.get("name", ""),
-            "author_id": user.get("contributor_id", ""),
-            "author_image": user.get("thumbnail", ""),
-            "author_reviews_count": user.get("reviews", ""),
-            "author_ratings_count": "",
-            "review_text": self.clean_text(review.get("snippet", "")),
-            "review_img_urls": "|".join(image_urls),
-            "review_img_url": image_urls[0] if image_urls else "",
-            "review_photo_ids": "",
-            "owner_answer": self.clean_text(owner_answer.get("answer", "")) if owner_answer else "",
-            "owner_answer_timestamp": owner_answer.get("time", "") if owner_answer else "",
-            "owner_answer_timestamp_datetime_utc": datetime.fromtimestamp(owner_answer.get("time", 0)).isoformat() if owner_answer and owner_answer.get("time") else "",
-            "review_link": review.get("link", ""),
-            "review_rating": review.get("rating"),
-            "review_timestamp": review.get("iso_date", ""),
-            "review_datetime_utc": review_date.isoformat() if review_date else "",
-            "months": "",
-            "year": review_date.year if review_date else "",
-            "month_year": review_date.strftime("%Y-%m") if review_date else "",
-            "review_likes": review.get("likes", ""),
-            "reviews_id": "",
-            "reviews_per_score_1": "",
-            "reviews_per_score_2": "",
-            "reviews_per_score_3": "",
-            "reviews_per_score_4": "",
-            "reviews_per_score_5": "",
-            "review_questions_Service": "",
-            "review_questions_Meal type": "",
-            "review_questions_Food": "",
-            "review_questions_Atmosphere": "",
-            "review_questions_Price per person": "",
-            "review_questions_Recommended dishes": "",
-            "review_questions": "",
-            "review_questions_Noise level": "",
-            "review_questions_Wait time": "",
-            "review_questions_Group size": "",
-            "review_questions_Special offers": "",
-            "review_questions_Parking space": "",
-            "review_questions_Parking options": "",
-            "review_questions_None": "",
-            "review_questions_Dietary restrictions": "",
-            "review_questions_Vegetarian options": "",
-            "review_questions_Parking": "",
-            "review_questions_Kid-friendliness": "",
-            "review_questions_Wheelchair accessibility": "",
-            "review_questions_Reservation": "",
-            "review_questions_Seating type": ""
-        }
+        failed = [label for label, r in results if "error" in r]
+        print(f"\nBatch done: {len(results) - len(failed)}/{len(results)} places, {sum(r.get('saved', 0) for _, r in results)} reviews saved")
+        for label in failed:
+            print(f"  Failed: {label}")
+        return dict(results)
+    
+    def merge_csv_files(self, filenames: List[str], merged_filename: str):
+        """Concatenate per-place CSV files into one, keeping a single header"""
+        header_written = False
+        with open(merged_filename, mode="w", newline="", encoding="utf-8") as out:
+            for filename in filenames:
+                if not os.path.exists(filename):
+                    continue
+                with open(filename, mode="r", newline="", encoding="utf-8") as part:
+                    header = part.readline()
+                    if not header_written:
+                        out.write(header)
+                        header_written = True
+                    shutil.copyfileobj(part, out)
+        print(f"Merged {len(filenames)} place files into {merged_filename}")
+    
+    def clean_text(self, text: str) -> str:
+        """Clean text by replacing newlines/tabs with spaces and normalizing whitespace"""
+        return clean_text(text)
+    
+    def format_review(self, review: Dict, place_id: Optional[str] = None) -> Dict:
+        """Format review to match CSV schema"""
+        row = ReviewTransform(place_id).build_row(review, parse_iso_date(review.get("iso_date", "")))
+        return dict(zip(FIELDNAMES, row))
     
     def save_to_csv(self, reviews: List[Dict], filename: str = "reviews.csv"):
         """Save reviews to CSV file (create new file)"""
@@ -277,10 +1355,8 @@ class SerpApiReviewFetcher:
             print("No reviews to save")
             return
         
-        fieldnames = ["query", "name", "google_id", "place_id", "location_link", "reviews_link", "reviews", "rating", "review_id", "review_pagination_id", "author_link", "author_title", "author_id", "author_image", "author_reviews_count", "author_ratings_count", "review_text", "review_img_urls", "review_img_url", "review_photo_ids", "owner_answer", "owner_answer_timestamp", "owner_answer_timestamp_datetime_utc", "review_link", "review_rating", "review_timestamp", "review_datetime_utc", "months", "year", "month_year", "review_likes", "reviews_id", "reviews_per_score_1", "reviews_per_score_2", "reviews_per_score_3", "reviews_per_score_4", "reviews_per_score_5", "review_questions_Service", "review_questions_Meal type", "review_questions_Food", "review_questions_Atmosphere", "review_questions_Price per person", "review_questions_Recommended dishes", "review_questions", "review_questions_Noise level", "review_questions_Wait time", "review_questions_Group size", "review_questions_Special offers", "review_questions_Parking space", "review_questions_Parking options", "review_questions_None", "review_questions_Dietary restrictions", "review_questions_Vegetarian options", "review_questions_Parking", "review_questions_Kid-friendliness", "review_questions_Wheelchair accessibility", "review_questions_Reservation", "review_questions_Seating type"]
-        
         with open(filename, mode="w", newline="", encoding="utf-8") as file:
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
+            writer = csv.DictWriter(file, fieldnames=FIELDNAMES)
             writer.writeheader()
             writer.writerows(reviews)
         
@@ -291,15 +1367,8 @@ class SerpApiReviewFetcher:
         if not reviews:
             return
         
-        fieldnames = ["query", "name", "google_id", "place_id", "location_link", "reviews_link", "reviews", "rating", "review_id", "review_pagination_id", "author_link", "author_title", "author_id", "author_image", "author_reviews_count", "author_ratings_count", "review_text", "review_img_urls", "review_img_url", "review_photo_ids", "owner_answer", "owner_answer_timestamp", "owner_answer_timestamp_datetime_utc", "review_link", "review_rating", "review_timestamp", "review_datetime_utc", "months", "year", "month_year", "review_likes", "reviews_id", "reviews_per_score_1", "reviews_per_score_2", "reviews_per_score_3", "reviews_per_score_4", "reviews_per_score_5", "review_questions_Service", "review_questions_Meal type", "review_questions_Food", "review_questions_Atmosphere", "review_questions_Price per person", "review_questions_Recommended dishes", "review_questions", "review_questions_Noise level", "review_questions_Wait time", "review_questions_Group size", "review_questions_Special offers", "review_questions_Parking space", "review_questions_Parking options", "review_questions_None", "review_questions_Dietary restrictions", "review_questions_Vegetarian options", "review_questions_Parking", "review_questions_Kid-friendliness", "review_questions_Wheelchair accessibility", "review_questions_Reservation", "review_questions_Seating type"]
-        
-        file_exists = os.path.exists(filename)
-        
-        with open(filename, mode="a", newline="", encoding="utf-8") as file:
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            if not file_exists:
-                writer.writeheader()
-            writer.writerows(reviews)
+        with CsvSink(filename) as sink:
+            sink.write(rows_from_dicts(reviews))
         
         print(f"Appended {len(reviews)} reviews to {filename}")
     
@@ -308,6 +1377,8 @@ class SerpApiReviewFetcher:
         if not start_date and not end_date:
             return reviews
         
+        start_dt = datetime.strptime(start_date, "%Y-%m-%d") if start_date else None
+        end_dt = datetime.strptime(end_date, "%Y-%m-%d") if end_date else None
         filtered = []
         
         for review in reviews:
@@ -318,27 +1389,62 @@ class SerpApiReviewFetcher:
             try:
                 review_date = datetime.fromisoformat(date_str)
                 review_date = review_date.replace(tzinfo=None)
-            except:
+            except ValueError:
                 continue
             
-            if start_date:
-                start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-                if review_date < start_dt:
-                    continue
+            if start_dt and review_date < start_dt:
+                continue
             
-            if end_date:
-                end_dt = datetime.strptime(end_date, "%Y-%m-%d")
-                if review_date > end_dt:
-                    continue
+            if end_dt and review_date > end_dt:
+                continue
             
             filtered.append(review)
         
         return filtered
 
-def main():
-    api_key = os.getenv("SERPAPI_KEY")
-    if not api_key:
-        print("Please set SERPAPI_KEY environment variable")
+def load_manifest(path: str) -> List[Dict]:
+    """Load a batch manifest CSV with place_id, data_id, url and/or name columns"""
+    with open(path, mode="r", newline="", encoding="utf-8") as file:
+        rows = [{k.strip(): (v or "").strip() for k, v in row.items() if k} for row in csv.DictReader(file)]
+    return [row for row in rows if any(row.get(k) for k in ("place_id", "data_id", "url", "name"))]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Fetch Google Place reviews using SerpApi")
+    parser.add_argument("--manifest", help="CSV of places to fetch (columns: place_id, data_id, url, name, optional label/start_date/end_date/max_pages)")
+    parser.add_argument("--workers", type=int, default=4, help="Max places fetched concurrently in batch mode")
+    parser.add_argument("--output-dir", default="reviews", help="Directory for per-place CSV files in batch mode")
+    parser.add_argument("--merge", metavar="FILE", help="Merge all per-place CSV files into FILE in batch mode")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="Output format (parquet needs pyarrow)")
+    parser.add_argument("--output", help="Output file for a single place (default reviews.csv / reviews.parquet)")
+    parser.add_argument("--flush-every", type=int, default=1, help="Flush the CSV (and checkpoint) every N pages")
+    parser.add_argument("--fsync", action="store_true", help="fsync the CSV on every flush")
+    parser.add_argument("--start-date", help="Start date (YYYY-MM-DD)")
+    parser.add_argument("--end-date", help="End date (YYYY-MM-DD)")
+    parser.add_argument("--max-pages", type=int, help="Max pages to fetch per place")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted run from its last checkpoint")
+    parser.add_argument("--incremental", action="store_true", help="Only fetch reviews newer than the ones already stored, and merge them in")
+    parser.add_argument("--state-file", default="review_sync_state.json", help="Per-place high-water marks for --incremental")
+    parser.add_argument("--dedupe-index", metavar="PATH", help="Skip reviews already written in earlier pages or runs (review_id + content hash index)")
+    parser.add_argument("--cache", metavar="PATH", help="Cache SerpApi responses in this SQLite file and reuse them on reruns")
+    parser.add_argument("--cache-max-mb", type=int, default=500, help="Evict least recently used cache entries beyond this size")
+    parser.add_argument("--offline", action="store_true", help="Replay responses from --cache only, never call SerpApi")
+    parser.add_argument("--rps", type=float, default=5.0, help="Max SerpApi requests per second (shared by all workers)")
+    parser.add_argument("--pool-size", type=int, default=10, help="Max pooled keep-alive connections to SerpApi")
+    parser.add_argument("--burst", type=int, default=5, help="Max requests sent back to back before --rps applies")
+    parser.add_argument("--analytics", metavar="PATH", help="Update per-place monthly rating aggregates in this .npz state as pages arrive (needs numpy, see analytics.py)")
+    parser.add_argument("--metrics-json", metavar="PATH", help="Write per-stage timings, retries and credits per place to PATH as JSON")
+    parser.add_argument("--metrics-prom", metavar="PATH", help="Write the same metrics in Prometheus text format to PATH")
+    parser.add_argument("--profile", metavar="PATH", help="cProfile the timed stages and write pstats data to PATH")
+    parser.add_argument("--profile-stages", help="Comma separated stages to profile (default: all), e.g. filter,format,sink")
+    return parser.parse_args()
+
+def run(args, fetcher: SerpApiReviewFetcher, state_store: Optional[SyncStateStore] = None, dedupe_index: Optional[ReviewIndex] = None, analytics=None):
+    """Fetch the --manifest batch, or the single place asked for interactively"""
+    if args.manifest:
+        places = load_manifest(args.manifest)
+        print(f"Loaded {len(places)} places from {args.manifest}")
+        with fetcher:
+            fetcher.fetch_batch(places, output_dir=args.output_dir, max_workers=args.workers, merged_filename=args.merge, sort_by="newestFirst", max_pages=args.max_pages, start_date=args.start_date, end_date=args.end_date, resume=args.resume, state_store=state_store, output_format=args.format, flush_every=args.flush_every, fsync=args.fsync, dedupe_index=dedupe_index, analytics=analytics)
         return
     
     input_str = input("Enter Place ID, Google Maps URL, or place name: ").strip()
@@ -347,34 +1453,68 @@ def main():
     max_pages_input = input("Max pages to fetch (or press Enter for all): ").strip() or None
     max_pages = int(max_pages_input) if max_pages_input else None
     
-    fetcher = SerpApiReviewFetcher(api_key)
-    place_id = None
-    data_id = None
-    
     try:
-        if "google.com/maps" in input_str or "goo.gl/maps" in input_str:
-            data_id = fetcher.extract_place_id_from_url(input_str)
-        elif not input_str.startswith("ChIJ"):
-            place_id = fetcher.get_place_id_from_name(input_str)
-        else:
-            place_id = input_str
+        place_id, data_id = fetcher.resolve_ids(input_str)
         
         if not place_id and not data_id:
             print("Could not find Place ID or data_id")
             return
         
-        filename = "reviews.csv"
+        filename = args.output or f"reviews.{args.format}"
         
-        # Always clear existing file before fetching (prevents old data from previous runs)
-        if os.path.exists(filename):
-            print(f"Removing old data from {filename}")
-            os.remove(filename)
+        if state_store:
+            fetcher.sync_reviews(place_id=place_id, data_id=data_id, filename=filename, state_store=state_store, dedupe_index=dedupe_index, analytics=analytics)
+            return
         
-        total_saved = fetcher.fetch_all_reviews(place_id=place_id, data_id=data_id, sort_by="newestFirst", max_pages=max_pages, filename=filename, start_date=start_date, end_date=end_date)
+        # fetch_all_reviews clears old data from previous runs unless resuming
+        total_saved = fetcher.fetch_all_reviews(place_id=place_id, data_id=data_id, sort_by="newestFirst", max_pages=max_pages, filename=filename, start_date=start_date, end_date=end_date, resume=args.resume, output_format=args.format, flush_every=args.flush_every, fsync=args.fsync, dedupe_index=dedupe_index, analytics=analytics)
     except Exception as e:
         print(f"Error: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        fetcher.close()
+
+def main():
+    args = parse_args()
+    api_key = os.getenv("SERPAPI_KEY")
+    if args.offline and not args.cache:
+        print("--offline needs --cache")
+        return
+    if not api_key and not args.offline:
+        print("Please set SERPAPI_KEY environment variable")
+        return
+    if args.incremental and args.format != "csv":
+        print("--incremental needs CSV output")
+        return
+    if args.dedupe_index and args.format != "csv":
+        print("--dedupe-index needs CSV output")
+        return
+    
+    cache = ResponseCache(args.cache, max_bytes=args.cache_max_mb * 1024 * 1024, offline=args.offline) if args.cache else None
+    profiler = StageProfiler(args.profile_stages.split(",") if args.profile_stages else None) if args.profile else None
+    metrics = RunMetrics(enabled=bool(args.metrics_json or args.metrics_prom or args.profile), hooks=[profiler] if profiler else None)
+    # Batch workers each need their own pooled connection
+    fetcher = SerpApiReviewFetcher(api_key or "", rate_limiter=RateLimiter(args.rps, args.burst), pool_size=max(args.pool_size, args.workers), cache=cache, metrics=metrics)
+    analytics = None
+    if args.analytics:
+        from analytics import ReviewAggregator
+        analytics = ReviewAggregator.load(args.analytics)
+    try:
+        run(args, fetcher, state_store=SyncStateStore(args.state_file) if args.incremental else None, dedupe_index=ReviewIndex(args.dedupe_index) if args.dedupe_index else None, analytics=analytics)
+    finally:
+        # Reviews already counted are skipped on the next update, so saving after a partial run is safe
+        if analytics:
+            analytics.save(args.analytics)
+            print(analytics.summary())
+        if metrics.enabled:
+            print(metrics.summary_line())
+        if args.metrics_json:
+            metrics.write_json(args.metrics_json)
+        if args.metrics_prom:
+            metrics.write_prometheus(args.metrics_prom)
+        if profiler:
+            profiler.dump(args.profile)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,73 @@
+"""Peak memory of fetch_all_reviews must not grow with the number of pages
+
+    python -m unittest discover -s tests
+"""
+
+import contextlib
+import os
+import sys
+import tempfile
+import tracemalloc
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fetch_reviews import SerpApiReviewFetcher
+
+PAGE_SIZE = 20
+NEWEST = datetime(2024, 6, 1)
+
+class SyntheticPagesFetcher(SerpApiReviewFetcher):
+    """Serves `pages` pages of raw SerpApi-shaped reviews without any HTTP"""
+    
+    def __init__(self, pages: int):
+        super().__init__("test")
+        self.pages = pages
+    
+    def fetch_reviews_page(self, place_id=None, next_page_token=None, num=20, retries=3, sort_by=None, data_id=None):
+        page = int(next_page_token) if next_page_token else 0
+        reviews = []
+        for index in range(page * PAGE_SIZE, (page + 1) * PAGE_SIZE):
+            reviews.append({
+                "review_id": f"r{index}",
+                "rating": index % 5 + 1,
+                "iso_date": (NEWEST - timedelta(minutes=index)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "snippet": "Friendly staff and good food. " * 20,
+                "user": {"name": f"User {index}", "link": f"https://www.google.com/maps/contrib/{index}"},
+                "images": [f"https://lh5.googleusercontent.com/p/{index}-{n}" for n in range(3)],
+                "owner_answer": {"answer": "Thank you for visiting! " * 10, "time": 1700000000},
+            })
+        data = {"reviews": reviews}
+        if page + 1 < self.pages:
+            data["serpapi_pagination"] = {"next_page_token": str(page + 1)}
+        return data
+
+def harvest_peak(pages: int, directory: str) -> int:
+    """Peak traced memory, in bytes, of harvesting `pages` pages into a CSV"""
+    fetcher = SyntheticPagesFetcher(pages)
+    filename = os.path.join(directory, f"reviews_{pages}.csv")
+    tracemalloc.start()
+    try:
+        # Progress output goes to devnull: capturing it would itself grow with the page count
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            saved = fetcher.fetch_all_reviews(place_id="P", filename=filename)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        fetcher.close()
+    assert saved == pages * PAGE_SIZE, saved
+    return peak
+
+class StreamingMemoryTest(unittest.TestCase):
+    def test_peak_memory_flat_in_page_count(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # Warm up imports and lazily built module state outside the measurement
+            harvest_peak(2, directory)
+            peak_100 = harvest_peak(100, directory)
+            peak_1000 = harvest_peak(1000, directory)
+        # Holding the raw pages would make the 1000-page peak about ten times the 100-page one
+        self.assertLess(peak_1000, peak_100 * 1.5, f"peak {peak_1000} bytes for 1000 pages vs {peak_100} for 100")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+"""Per-company print() vs the batched CompanyWriter, on a synthetic list of companies.
+
+	python3 benchmarks/bench_output.py --companies 10000
+
+Output goes into a pipe drained by a background thread, as when main.py is piped
+into another tool. print() is measured with a line-buffered stdout (a terminal or
+python -u) and with the default block buffering. Write syscalls come from
+/proc/self/io (Linux only).
+"""
+
+import argparse
+import io
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import CompanyWriter, print_company
+
+
+def synthetic_companies(count: int):
+	sectors = ["Energi", "Keuangan", "Barang Baku", "Properti & Real Estat", "Teknologi"]
+	return [
+		{
+			"KodeEmiten": f"C{index:04d}",
+			"NamaEmiten": f"PT Contoh Perusahaan {index} Tbk.",
+			"Alamat": f"Jl. Jend. Sudirman Kav. {index}, Jakarta Selatan",
+			"Sektor": sectors[index % len(sectors)],
+			"SubSektor": f"Sub {index % 12}",
+			"Industri": f"Industri {index % 30}",
+			"SubIndustri": f"Sub Industri {index % 60}",
+			"PapanPencatatan": "Utama" if index % 3 else "Pengembangan",
+			"TanggalPencatatan": f"{1990 + index % 34}-{index % 12 + 1:02d}-{index % 28 + 1:02d}T00:00:00",
+			"Website": f"www.contoh{index}.co.id",
+		}
+		for index in range(count)
+	]
+
+
+def write_syscalls() -> int:
+	try:
+		with open("/proc/self/io") as file:
+			for line in file:
+				if line.startswith("syscw:"):
+					return int(line.split()[1])
+	except OSError:
+		pass
+	return -1
+
+
+class DrainedPipe:
+	"""Write end of a pipe whose read end is emptied by a thread."""
+
+	def __init__(self):
+		read_fd, write_fd = os.pipe()
+		self.reader = os.fdopen(read_fd, "rb", buffering=0)
+		self.writer = os.fdopen(write_fd, "wb", buffering=0)
+		self.bytes = 0
+		self.thread = threading.Thread(target=self.drain, daemon=True)
+		self.thread.start()
+
+	def drain(self):
+		while True:
+			chunk = self.reader.read(1 << 16)
+			if not chunk:
+				return
+			self.bytes += len(chunk)
+
+	def close(self) -> int:
+		self.writer.close()
+		self.thread.join()
+		self.reader.close()
+		return self.bytes
+
+
+def measure(name: str, run):
+	pipe = DrainedPipe()
+	before = write_syscalls()
+	started = time.perf_counter()
+	run(pipe.writer)
+	elapsed = time.perf_counter() - started
+	syscalls = write_syscalls() - before if before >= 0 else None
+	size = pipe.close()
+	print(f"{name:>28}: {elapsed * 1000:7.1f}ms, {'n/a' if syscalls is None else syscalls:>6} write syscalls, {size} bytes", file=sys.stderr)
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--companies", type=int, default=10000)
+	args = parser.parse_args()
+	companies = synthetic_companies(args.companies)
+
+	def printed(line_buffering: bool):
+		def run(raw):
+			stdout = sys.stdout
+			sys.stdout = io.TextIOWrapper(raw, encoding="utf-8", line_buffering=line_buffering, write_through=False)
+			try:
+				print(f"Found {len(companies)} companies")
+				for c in companies:
+					print_company(c)
+				sys.stdout.flush()
+			finally:
+				sys.stdout.detach()
+				sys.stdout = stdout
+		return run
+
+	def written(fmt: str):
+		def run(raw):
+			writer = CompanyWriter(raw, fmt)
+			writer.write_all(companies)
+			if fmt == "lines":
+				writer.summary(len(companies))
+			writer.flush()
+		return run
+
+	measure("print(), line buffered", printed(True))
+	measure("print(), block buffered", printed(False))
+	for fmt in CompanyWriter.FORMATS:
+		measure(f"CompanyWriter({fmt})", written(fmt))
+
+
+if __name__ == "__main__":
+	main()
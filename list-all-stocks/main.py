@@ -5,51 +5,723 @@ HTTP request to the public endpoint and prints each company's JSON on a
 separate line. It's lightweight and doesn't require a browser binary.
 """
 
+import bisect
+import codecs
+import hashlib
 import json
+import os
 import sys
-from typing import List, Dict
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.error import HTTPError
 from urllib.request import urlopen, Request
 
-LINK = "https://idx.co.id/primary/ListedCompany/GetCompanyProfiles?emitenType=s&start=0&length=9999"
+BASE_URL = "https://idx.co.id/primary/ListedCompany/GetCompanyProfiles"
 
 
-def fetch_companies() -> List[Dict]:
+def build_url(start: int, length: int, base_url: str = BASE_URL) -> str:
+	return f"{base_url}?emitenType=s&start={start}&length={length}"
+
+
+LINK = build_url(0, 9999)
+
+HEADERS = {
+	"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36",
+	"Accept": "application/json, text/javascript, */*; q=0.01",
+	"Accept-Language": "en-US,en;q=0.9",
+	"X-Requested-With": "XMLHttpRequest",
+	"Referer": "https://idx.co.id/",
+	"Origin": "https://idx.co.id",
+}
+
+
+# Characters that may follow a complete JSON value
+VALUE_DELIMITERS = ",:]} \t\r\n"
+
+
+def iter_json_array(stream, key: str = "data", chunk_size: int = 64 * 1024, meta: Optional[Dict] = None) -> Iterator:
+	"""Yield the items of the `key` array of a top-level JSON object, reading stream in chunks.
+
+	Only the current chunk and the item being decoded are held in memory, so the
+	first item is available long before the whole response has arrived. Other
+	top-level values seen before the array (e.g. recordsTotal) are stored in meta.
+	An object without the `key` array (e.g. an error body like {"message": ...})
+	raises ValueError rather than looking like an empty listing.
+	"""
+	decoder = json.JSONDecoder()
+	utf8 = codecs.getincrementaldecoder("utf-8")(errors="replace")
+	buf = ""
+	pos = 0
+	eof = False
+
+	def fill():
+		nonlocal buf, pos, eof
+		chunk = stream.read(chunk_size)
+		eof = not chunk
+		# Drop what has been consumed so the buffer stays around one chunk
+		buf = buf[pos:] + utf8.decode(chunk or b"", final=eof)
+		pos = 0
+
+	def skip_ws():
+		nonlocal pos
+		while True:
+			while pos < len(buf) and buf[pos] in " \t\r\n":
+				pos += 1
+			if pos < len(buf) or eof:
+				return
+			fill()
+
+	def expect(chars: str) -> str:
+		nonlocal pos
+		skip_ws()
+		if pos >= len(buf) or buf[pos] not in chars:
+			raise ValueError(f"Expected one of {chars!r} in JSON stream")
+		pos += 1
+		return buf[pos - 1]
+
+	def value():
+		nonlocal pos
+		while True:
+			skip_ws()
+			try:
+				obj, end = decoder.raw_decode(buf, pos)
+			except json.JSONDecodeError:
+				if eof:
+					raise
+				fill()
+				continue
+			# A number or literal is only complete once a delimiter follows it: "1." or "1e"
+			# at the buffer edge decode as 1, but the number goes on in the next chunk
+			if not eof and (end == len(buf) or buf[end] not in VALUE_DELIMITERS):
+				fill()
+				continue
+			pos = end
+			return obj
+
+	missing = ValueError(f"No {key!r} array in JSON response")
+	expect("{")
+	skip_ws()
+	if buf[pos:pos + 1] == "}":
+		raise missing
+	while True:
+		name = value()
+		expect(":")
+		if name == key:
+			expect("[")
+			skip_ws()
+			if buf[pos:pos + 1] == "]":
+				return
+			while True:
+				yield value()
+				if expect(",]") == "]":
+					return
+		other = value()
+		if meta is not None:
+			meta[name] = other
+		if expect(",}") == "}":
+			raise missing
+
+
+def iter_companies(url: str = LINK, timeout: int = 15, validators: Optional[Dict] = None, status: Optional[Dict] = None) -> Iterator[Dict]:
+	"""Yield companies one by one while the response is still being downloaded.
+
+	validators are conditional request headers (If-None-Match / If-Modified-Since).
+	If status is given it receives the response's etag/last_modified, not_modified
+	(the server answered 304) and a list of errors.
+	"""
+	status = status if status is not None else {}
+	status.setdefault("errors", [])
 	try:
-		headers = {
-			"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36",
-			"Accept": "application/json, text/javascript, */*; q=0.01",
-			"Accept-Language": "en-US,en;q=0.9",
-			"X-Requested-With": "XMLHttpRequest",
-			"Referer": "https://idx.co.id/",
-			"Origin": "https://idx.co.id",
-		}
-		req = Request(LINK, headers=headers)
-		with urlopen(req, timeout=15) as resp:
-			raw = resp.read()
-			text = raw.decode("utf-8", errors="replace")
+		resp = urlopen(Request(url, headers=dict(HEADERS, **(validators or {}))), timeout=timeout)
+	except HTTPError as e:
+		if e.code == 304:
+			status["not_modified"] = True
+			return
+		print(f"Failed to fetch data: {e}", file=sys.stderr)
+		status["errors"].append(str(e))
+		return
 	except Exception as e:
 		print(f"Failed to fetch data: {e}", file=sys.stderr)
-		return []
+		status["errors"].append(str(e))
+		return
+
+	status["etag"] = resp.headers.get("ETag")
+	status["last_modified"] = resp.headers.get("Last-Modified")
+	with resp:
+		try:
+			for company in iter_json_array(resp, "data"):
+				yield company
+		except ValueError as e:
+			print(f"Failed to parse JSON: {e}", file=sys.stderr)
+			status["errors"].append(str(e))
+		except Exception as e:
+			print(f"Failed to fetch data: {e}", file=sys.stderr)
+			status["errors"].append(str(e))
+
+
+def fetch_companies() -> List[Dict]:
+	return list(iter_companies())
+
+
+def fetch_window(start: int, length: int, timeout: int = 15, retries: int = 3, base_url: str = BASE_URL) -> Tuple[List[Dict], Optional[int]]:
+	"""Fetch one start/length window with retries, returns (companies, recordsTotal).
+
+	Always makes at least one attempt and raises if the window could not be fetched.
+	"""
+	retries = max(1, retries)
+	for attempt in range(retries):
+		meta = {}
+		try:
+			with urlopen(Request(build_url(start, length, base_url), headers=HEADERS), timeout=timeout) as resp:
+				companies = list(iter_json_array(resp, "data", meta=meta))
+			total = meta.get("recordsTotal")
+			return companies, total if isinstance(total, int) else None
+		except Exception as e:
+			if attempt == retries - 1:
+				raise
+			delay = 2 ** attempt
+			print(f"Window {start}+{length} failed: {e}. Retrying in {delay}s...", file=sys.stderr)
+			time.sleep(delay)
+	raise RuntimeError(f"Window {start}+{length} was not fetched")
 
+
+def iter_companies_paged(page_size: int = 100, workers: int = 8, timeout: int = 15, retries: int = 3, base_url: str = BASE_URL, status: Optional[Dict] = None) -> Iterator[Dict]:
+	"""Yield companies fetched as concurrent start/length windows, in listing order.
+
+	The first window tells us recordsTotal; the rest are fetched by a bounded pool
+	and each is retried on its own, so one failing window only loses that window
+	(and is listed in status["errors"]).
+	"""
+	status = status if status is not None else {}
+	status.setdefault("errors", [])
 	try:
-		data = json.loads(text)
+		first, total = fetch_window(0, page_size, timeout, retries, base_url)
 	except Exception as e:
-		print(f"Failed to parse JSON: {e}", file=sys.stderr)
-		return []
+		print(f"Failed to fetch data: {e}", file=sys.stderr)
+		status["errors"].append(str(e))
+		return
+	yield from first
 
-	return data.get("data", []) if isinstance(data, dict) else []
+	if total is None:
+		# No recordsTotal before the data array: page sequentially until a short window
+		start = page_size
+		count = len(first)
+		while count == page_size:
+			try:
+				window, _ = fetch_window(start, page_size, timeout, retries, base_url)
+			except Exception as e:
+				print(f"Failed to fetch window {start}+{page_size}: {e}", file=sys.stderr)
+				status["errors"].append(str(e))
+				return
+			yield from window
+			count = len(window)
+			start += page_size
+		return
 
+	from concurrent.futures import ThreadPoolExecutor
 
-def main():
-	companies = fetch_companies()
-	print(f"Found {len(companies)} companies")
-	for c in companies:
-		# show code with .JK suffix and the full JSON for flexibility
+	with ThreadPoolExecutor(max_workers=workers) as pool:
+		starts = range(page_size, total, page_size)
+		futures = [pool.submit(fetch_window, start, page_size, timeout, retries, base_url) for start in starts]
+		for start, future in zip(starts, futures):
+			try:
+				window, _ = future.result()
+			except Exception as e:
+				print(f"Failed to fetch window {start}+{page_size}, skipping it: {e}", file=sys.stderr)
+				status["errors"].append(str(e))
+				continue
+			yield from window
+
+
+def fetch_companies_paged(page_size: int = 100, workers: int = 8, timeout: int = 15, retries: int = 3, base_url: str = BASE_URL) -> List[Dict]:
+	return list(iter_companies_paged(page_size, workers, timeout, retries, base_url))
+
+
+class SnapshotStore:
+	"""Last seen company list keyed by KodeEmiten, with a content hash per record.
+
+	diff() compares a fresh listing against it so only added, removed and changed
+	companies need to be passed on. The response's ETag/Last-Modified are kept
+	for conditional requests on the next run.
+	"""
+
+	def __init__(self, path: str = "companies_snapshot.json"):
+		self.path = path
+		self.etag = None
+		self.last_modified = None
+		self.companies = {}
+		if os.path.exists(path):
+			with open(path, "r", encoding="utf-8") as f:
+				data = json.load(f)
+			self.etag = data.get("etag")
+			self.last_modified = data.get("last_modified")
+			self.companies = data.get("companies", {})
+
+	@staticmethod
+	def record_hash(company: Dict) -> str:
+		return hashlib.sha256(json.dumps(company, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+	def validators(self) -> Dict:
+		"""Conditional request headers for the stored response, if any."""
+		headers = {}
+		if self.etag:
+			headers["If-None-Match"] = self.etag
+		if self.last_modified:
+			headers["If-Modified-Since"] = self.last_modified
+		return headers
+
+	def diff(self, companies: List[Dict]) -> List[Dict]:
+		"""Added, removed and changed companies (with a field-level delta) since the snapshot."""
+		changes = []
+		seen = set()
+		for c in companies:
+			code = c.get("KodeEmiten")
+			if not code:
+				continue
+			seen.add(code)
+			old = self.companies.get(code)
+			if old is None:
+				changes.append({"change": "added", "KodeEmiten": code, "record": c})
+			elif old["hash"] != self.record_hash(c):
+				before = old["record"]
+				delta = {
+					field: {"old": before.get(field), "new": c.get(field)}
+					for field in sorted(set(before) | set(c))
+					if before.get(field) != c.get(field)
+				}
+				changes.append({"change": "changed", "KodeEmiten": code, "delta": delta})
+		for code, old in self.companies.items():
+			if code not in seen:
+				changes.append({"change": "removed", "KodeEmiten": code, "record": old["record"]})
+		return changes
+
+	def update(self, companies: List[Dict], etag: Optional[str] = None, last_modified: Optional[str] = None):
+		"""Replace the snapshot with companies and write it atomically."""
+		self.companies = {c["KodeEmiten"]: {"hash": self.record_hash(c), "record": c} for c in companies if c.get("KodeEmiten")}
+		self.etag = etag
+		self.last_modified = last_modified
+		tmp_path = self.path + ".tmp"
+		with open(tmp_path, "w", encoding="utf-8") as f:
+			json.dump({"etag": etag, "last_modified": last_modified, "companies": self.companies}, f, ensure_ascii=False)
+		os.replace(tmp_path, self.path)
+
+
+class CompanyRegistry:
+	"""Indexed, in-memory view of a company listing.
+
+	Records are tuples in one shared field order. KodeEmiten has a hash index,
+	the categorical fields in INDEXED_FIELDS map each value to record positions,
+	and the listing date has a sorted index for range queries. The whole thing
+	(indexes included) pickles to a compact binary snapshot for fast cold starts.
+	"""
+
+	INDEXED_FIELDS = ("Sektor", "SubSektor", "Industri", "SubIndustri", "PapanPencatatan")
+	DATE_FIELD = "TanggalPencatatan"
+	SNAPSHOT_VERSION = 1
+
+	def __init__(self, companies: List[Dict]):
+		fields = {}
+		for c in companies:
+			for field in c:
+				fields.setdefault(field, None)
+		self.fields = tuple(fields)
+		self.field_index = {field: i for i, field in enumerate(self.fields)}
+		self.rows = [tuple(c.get(field) for field in self.fields) for c in companies]
+		self.build_indexes()
+
+	def build_indexes(self):
+		ticker = self.field_index.get("KodeEmiten")
+		self.by_ticker = {}
+		if ticker is not None:
+			for pos, row in enumerate(self.rows):
+				if row[ticker]:
+					self.by_ticker[row[ticker].upper()] = pos
+
+		self.by_field = {}
+		for field in self.INDEXED_FIELDS:
+			i = self.field_index.get(field)
+			if i is None:
+				continue
+			index = self.by_field[field] = {}
+			for pos, row in enumerate(self.rows):
+				index.setdefault(row[i], []).append(pos)
+
+		# ISO dates ("1990-05-31T00:00:00") sort correctly as YYYY-MM-DD strings
+		i = self.field_index.get(self.DATE_FIELD)
+		dated = sorted((row[i][:10], pos) for pos, row in enumerate(self.rows) if row[i]) if i is not None else []
+		self.date_keys = [date for date, _ in dated]
+		self.date_positions = [pos for _, pos in dated]
+
+	def __len__(self) -> int:
+		return len(self.rows)
+
+	def record(self, pos: int) -> Dict:
+		return dict(zip(self.fields, self.rows[pos]))
+
+	def get(self, ticker: str) -> Optional[Dict]:
+		"""Company by ticker (with or without the .JK suffix), O(1)."""
+		ticker = ticker.upper()
+		if ticker.endswith(".JK"):
+			ticker = ticker[:-3]
+		pos = self.by_ticker.get(ticker)
+		return self.record(pos) if pos is not None else None
+
+	def where(self, **criteria) -> List[Dict]:
+		"""Companies whose fields equal all criteria, e.g. where(Sektor="Keuangan", PapanPencatatan="Utama")."""
+		positions = None
+		rest = {}
+		for field, value in criteria.items():
+			if field in self.by_field:
+				matches = self.by_field[field].get(value, [])
+				positions = set(matches) if positions is None else positions.intersection(matches)
+			else:
+				rest[field] = value
+		if positions is None:
+			positions = range(len(self.rows))
+		results = []
+		for pos in sorted(positions):
+			row = self.rows[pos]
+			if all(field in self.field_index and row[self.field_index[field]] == value for field, value in rest.items()):
+				results.append(self.record(pos))
+		return results
+
+	def listed_between(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+		"""Companies listed on or between start and end (YYYY-MM-DD, inclusive), O(log n + matches)."""
+		lo = bisect.bisect_left(self.date_keys, start) if start else 0
+		hi = bisect.bisect_right(self.date_keys, end) if end else len(self.date_keys)
+		return [self.record(pos) for pos in self.date_positions[lo:hi]]
+
+	def companies(self) -> List[Dict]:
+		return [self.record(pos) for pos in range(len(self.rows))]
+
+	def to_bytes(self) -> bytes:
+		import pickle
+
+		state = {k: getattr(self, k) for k in ("fields", "rows", "by_ticker", "by_field", "date_keys", "date_positions")}
+		state["version"] = self.SNAPSHOT_VERSION
+		return pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+
+	@classmethod
+	def from_bytes(cls, data: bytes) -> "CompanyRegistry":
+		# Only load snapshots this script wrote itself: pickle is not safe for untrusted input
+		import pickle
+
+		state = pickle.loads(data)
+		if state.pop("version", None) != cls.SNAPSHOT_VERSION:
+			raise ValueError("Unsupported registry snapshot version")
+		registry = cls.__new__(cls)
+		registry.__dict__.update(state)
+		registry.field_index = {field: i for i, field in enumerate(registry.fields)}
+		return registry
+
+	def save(self, path: str):
+		tmp_path = path + ".tmp"
+		with open(tmp_path, "wb") as f:
+			f.write(self.to_bytes())
+		os.replace(tmp_path, path)
+
+	@classmethod
+	def load(cls, path: str) -> "CompanyRegistry":
+		with open(path, "rb") as f:
+			return cls.from_bytes(f.read())
+
+
+def run_diff(args) -> int:
+	"""Print only the companies that changed since the last snapshot, then update it."""
+	store = SnapshotStore(args.snapshot)
+	status = {}
+	if args.page_size:
+		# Conditional requests only make sense for the single full-listing response
+		companies = list(iter_companies_paged(args.page_size, args.workers, args.timeout, args.retries, status=status))
+	else:
+		companies = list(iter_companies(LINK, args.timeout, validators=store.validators() if store.companies else None, status=status))
+
+	if status.get("not_modified"):
+		print("Not modified since last snapshot: 0 changes", file=sys.stderr)
+		return 0
+	if status["errors"]:
+		# A partial listing would show up as removed companies, so don't diff or save it
+		print("Listing incomplete, snapshot left unchanged", file=sys.stderr)
+		return 1
+
+	changes = store.diff(companies)
+	for change in changes:
+		print(json.dumps(change, ensure_ascii=False))
+	store.update(companies, status.get("etag"), status.get("last_modified"))
+	counts = {kind: sum(1 for c in changes if c["change"] == kind) for kind in ("added", "removed", "changed")}
+	print(f"{counts['added']} added, {counts['removed']} removed, {counts['changed']} changed out of {len(companies)} companies", file=sys.stderr)
+	return 0
+
+
+class CompanyWriter:
+	"""Batched company output to a binary stream.
+
+	Formats:
+	  lines   - "CODE.JK {json}" per company, same as print_company (default)
+	  ndjson  - one JSON object per line
+	  csv     - header from the first company's fields, one row per company
+	  tickers - only the "CODE.JK" symbol per line
+
+	Lines are encoded with one reusable JSON encoder and written in batches of
+	batch_size, so the stream sees one write per batch instead of one per company.
+	"""
+
+	FORMATS = ("lines", "ndjson", "csv", "tickers")
+
+	def __init__(self, stream, fmt: str = "lines", batch_size: int = 500):
+		if fmt not in self.FORMATS:
+			raise ValueError(f"Unknown output format: {fmt}")
+		self.stream = stream
+		self.fmt = fmt
+		self.batch_size = max(1, batch_size)
+		self.encode = json.JSONEncoder(ensure_ascii=False).encode
+		self.pending = []
+		self.csv_buffer = None
+		self.csv_writer = None
+
+	def format_line(self, c: Dict) -> str:
 		code = c.get("KodeEmiten")
-		if code:
-			print(code + ".JK", json.dumps(c, ensure_ascii=False))
+		if self.fmt == "lines":
+			return (code + ".JK " if code else "") + self.encode(c) + "\n"
+		if self.fmt == "ndjson":
+			return self.encode(c) + "\n"
+		return code + ".JK\n" if code else ""
+
+	def format_csv(self, c: Dict) -> str:
+		if self.csv_writer is None:
+			import csv
+			import io
+
+			self.csv_buffer = io.StringIO()
+			self.csv_writer = csv.DictWriter(self.csv_buffer, fieldnames=list(c), extrasaction="ignore", lineterminator="\n")
+			self.csv_writer.writeheader()
+		self.csv_writer.writerow(c)
+		line = self.csv_buffer.getvalue()
+		self.csv_buffer.seek(0)
+		self.csv_buffer.truncate()
+		return line
+
+	def write(self, c: Dict):
+		self.pending.append(self.format_csv(c) if self.fmt == "csv" else self.format_line(c))
+		if len(self.pending) >= self.batch_size:
+			self.flush()
+
+	def write_all(self, companies):
+		for c in companies:
+			self.write(c)
+
+	def summary(self, count: int):
+		# Only the default format carries the count in-band; it would corrupt NDJSON/CSV/ticker output
+		line = f"Found {count} companies\n"
+		if self.fmt == "lines":
+			self.pending.append(line)
 		else:
-			print(json.dumps(c, ensure_ascii=False))
+			self.flush()
+			sys.stderr.write(line)
+
+	def flush(self):
+		if self.pending:
+			self.stream.write("".join(self.pending).encode("utf-8"))
+			self.pending = []
+		self.stream.flush()
+
+
+def print_company(c: Dict):
+	# show code with .JK suffix and the full JSON for flexibility
+	code = c.get("KodeEmiten")
+	if code:
+		print(code + ".JK", json.dumps(c, ensure_ascii=False))
+	else:
+		print(json.dumps(c, ensure_ascii=False))
+
+
+def parse_args():
+	import argparse
+
+	parser = argparse.ArgumentParser(description="Fetch listed companies from IDX")
+	parser.add_argument("--stream", action="store_true", help="Print companies as they are parsed (count is printed last)")
+	parser.add_argument("--page-size", type=int, help="Fetch the listing in concurrent start/length windows of this size")
+	parser.add_argument("--workers", type=int, default=8, help="Max windows fetched at once with --page-size")
+	parser.add_argument("--timeout", type=int, default=15, help="Per-request timeout in seconds")
+	parser.add_argument("--retries", type=int, default=3, help="Attempts per window with --page-size")
+	parser.add_argument("--diff", action="store_true", help="Print only added/removed/changed companies since the last --snapshot")
+	parser.add_argument("--snapshot", default="companies_snapshot.json", help="Snapshot file used by --diff")
+	parser.add_argument("--ticker", action="append", help="Only print this ticker (repeatable)")
+	parser.add_argument("--sector", help="Only print companies in this Sektor")
+	parser.add_argument("--sub-sector", help="Only print companies in this SubSektor")
+	parser.add_argument("--board", help="Only print companies on this PapanPencatatan (board)")
+	parser.add_argument("--listed-from", help="Only print companies listed on or after this date (YYYY-MM-DD)")
+	parser.add_argument("--listed-to", help="Only print companies listed on or before this date (YYYY-MM-DD)")
+	parser.add_argument("--load-registry", metavar="PATH", help="Use a saved registry snapshot instead of fetching from IDX")
+	parser.add_argument("--save-registry", metavar="PATH", help="Save the fetched listing as a binary registry snapshot")
+	parser.add_argument("--format", choices=CompanyWriter.FORMATS, default="lines", help="Output format (default: lines, \"CODE.JK {json}\")")
+	parser.add_argument("--output", metavar="PATH", help="Write to this file instead of stdout")
+	parser.add_argument("--batch-size", type=int, default=500, help="Companies per output write")
+	args = parser.parse_args()
+	for name in ("page_size", "workers", "retries"):
+		value = getattr(args, name)
+		if value is not None and value < 1:
+			parser.error(f"--{name.replace('_', '-')} must be at least 1")
+	return args
+
+
+def filter_companies(registry: CompanyRegistry, args) -> List[Dict]:
+	"""Apply the CLI filters through the registry indexes."""
+	if args.ticker:
+		results = [c for c in (registry.get(t) for t in args.ticker) if c]
+	elif args.listed_from or args.listed_to:
+		results = registry.listed_between(args.listed_from, args.listed_to)
+	else:
+		results = registry.companies()
+
+	criteria = {field: value for field, value in (("Sektor", args.sector), ("SubSektor", args.sub_sector), ("PapanPencatatan", args.board)) if value}
+	if criteria:
+		codes = {c.get("KodeEmiten") for c in registry.where(**criteria)}
+		results = [c for c in results if c.get("KodeEmiten") in codes]
+	if args.ticker and (args.listed_from or args.listed_to):
+		codes = {c.get("KodeEmiten") for c in registry.listed_between(args.listed_from, args.listed_to)}
+		results = [c for c in results if c.get("KodeEmiten") in codes]
+	return results
+
+
+def main():
+	args = parse_args()
+	if args.diff:
+		sys.exit(run_diff(args))
+
+	if args.load_registry:
+		source = iter(CompanyRegistry.load(args.load_registry).companies())
+	elif args.page_size:
+		source = iter_companies_paged(args.page_size, args.workers, args.timeout, args.retries)
+	else:
+		source = iter_companies(LINK, args.timeout)
+
+	filtering = args.ticker or args.sector or args.sub_sector or args.board or args.listed_from or args.listed_to
+	if args.save_registry or filtering:
+		registry = CompanyRegistry(list(source))
+		if args.save_registry:
+			registry.save(args.save_registry)
+		source = iter(filter_companies(registry, args) if filtering else registry.companies())
+
+	if args.output:
+		out = open(args.output, "wb")
+	else:
+		sys.stdout.flush()
+		out = sys.stdout.buffer
+	writer = CompanyWriter(out, args.format, args.batch_size)
+	try:
+		if args.stream:
+			count = 0
+			for c in source:
+				writer.write(c)
+				count += 1
+			writer.summary(count)
+		else:
+			companies = list(source)
+			writer.summary(len(companies))
+			writer.write_all(companies)
+		writer.flush()
+	except BrokenPipeError:
+		# Downstream reader (e.g. `head`) closed the pipe; stop quietly
+		os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+	finally:
+		if args.output:
+			out.close()
+
+
+# Lambda: the registry lives in module scope so warm invocations skip the IDX download
+_lambda_cache = {"registry": None, "loaded_at": 0.0}
+
+
+def get_registry(refresh: bool = False) -> Tuple[CompanyRegistry, bool, bool]:
+	"""Cached CompanyRegistry, refetched after CACHE_TTL_SECONDS (default 3600).
+
+	Returns (registry, cached, stale); stale is True when a refetch failed and the
+	previous listing is served instead.
+	"""
+	ttl = float(os.environ.get("CACHE_TTL_SECONDS", "3600"))
+	registry = _lambda_cache["registry"]
+	if registry is not None and not refresh and time.time() - _lambda_cache["loaded_at"] < ttl:
+		return registry, True, False
+
+	status = {}
+	base_url = os.environ.get("IDX_BASE_URL", BASE_URL)
+	companies = list(iter_companies(build_url(0, 9999, base_url), int(os.environ.get("IDX_TIMEOUT", "15")), status=status))
+	if status["errors"]:
+		if registry is not None:
+			# Serve the stale listing rather than failing, and try again next invocation
+			return registry, True, True
+		raise RuntimeError(f"Failed to fetch IDX listing: {status['errors'][0]}")
+	registry = CompanyRegistry(companies)
+	_lambda_cache.update(registry=registry, loaded_at=time.time())
+	return registry, False, False
+
+
+def split_param(value) -> List[str]:
+	# Query strings give "BBCA,TLKM", direct invocations may pass a list
+	if value is None:
+		return []
+	if isinstance(value, str):
+		value = value.split(",")
+	return [str(v).strip() for v in value if str(v).strip()]
+
+
+def lambda_handler(event, context):
+	"""AWS Lambda entry point.
+
+	Parameters come from the event itself or from queryStringParameters (API Gateway):
+	  ticker / tickers  - one or more codes, comma separated, with or without .JK
+	  sector, sub_sector, board, industry - exact field matches
+	  listed_from, listed_to - listing date range (YYYY-MM-DD)
+	  fields - only return these fields, comma separated
+	  refresh - "true" to bypass the cached listing
+	"""
+	event = event or {}
+	api_gateway = "queryStringParameters" in event or "requestContext" in event
+	params = (event.get("queryStringParameters") or {}) if api_gateway else event
+
+	try:
+		refresh = str(params.get("refresh", "")).lower() in ("1", "true", "yes")
+		registry, cached, stale = get_registry(refresh)
+
+		tickers = split_param(params.get("tickers")) + split_param(params.get("ticker"))
+		listed_from, listed_to = params.get("listed_from"), params.get("listed_to")
+		if tickers:
+			companies = [c for c in (registry.get(t) for t in tickers) if c]
+			if listed_from or listed_to:
+				codes = {c.get("KodeEmiten") for c in registry.listed_between(listed_from, listed_to)}
+				companies = [c for c in companies if c.get("KodeEmiten") in codes]
+		elif listed_from or listed_to:
+			companies = registry.listed_between(listed_from, listed_to)
+		else:
+			companies = None
+
+		criteria = {field: params[key] for key, field in (("sector", "Sektor"), ("sub_sector", "SubSektor"), ("industry", "Industri"), ("board", "PapanPencatatan")) if params.get(key)}
+		if criteria:
+			matches = registry.where(**criteria)
+			if companies is not None:
+				codes = {c.get("KodeEmiten") for c in matches}
+				matches = [c for c in companies if c.get("KodeEmiten") in codes]
+			companies = matches
+		if companies is None:
+			companies = registry.companies()
+
+		fields = split_param(params.get("fields"))
+		if fields:
+			companies = [{f: c.get(f) for f in fields} for c in companies]
+
+		result = {"count": len(companies), "cached": cached, "stale": stale, "companies": companies}
+		code = 200
+	except Exception as e:
+		print(f"Lambda request failed: {e}", file=sys.stderr)
+		result = {"error": str(e)}
+		code = 502
+
+	if api_gateway:
+		return {"statusCode": code, "headers": {"Content-Type": "application/json"}, "body": json.dumps(result, ensure_ascii=False)}
+	if code != 200:
+		raise RuntimeError(result["error"])
+	return result
 
 
 if __name__ == "__main__":
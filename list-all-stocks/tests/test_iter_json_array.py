@@ -0,0 +1,58 @@
+"""iter_json_array must give the same result as json.loads for every chunk size.
+
+	python -m unittest discover -s tests
+"""
+
+import io
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import iter_json_array
+
+DOCUMENTS = [
+	'{"data":[1.25, 2]}',
+	'{"n":1.5,"data":[1]}',
+	'{"recordsTotal":1.5e3,"x":-2E-2,"data":[1.25e+2,-0.5,3,true,false,null,"s",{"a":1.5e-1},[1e2]],"after":2.5}',
+	'{"data":[12345678901234567890.125e-10,0,-1]}',
+	'{"a":{"b":[1.0]},"data":[{"KodeEmiten":"AALI","Nama":"Astra Agro Lestari Tbk. \\u00e9","n":[1,2.5e1]}]}',
+	' { "n" : 1.5 , "data" : [ 1.25 , 2e1 ] } ',
+	'{"data":[]}',
+]
+
+# Objects without a data array, e.g. an error body served with status 200
+MISSING_DATA = [
+	'{}',
+	'{"message":"rate limited"}',
+	'{"recordsTotal":0,"Data":[1]}',
+]
+
+
+class IterJsonArrayTest(unittest.TestCase):
+	def test_matches_json_loads_at_every_chunk_size(self):
+		for document in DOCUMENTS:
+			expected = json.loads(document)
+			raw = document.encode("utf-8")
+			for chunk_size in range(1, len(raw) + 2):
+				with self.subTest(document=document, chunk_size=chunk_size):
+					meta = {}
+					items = list(iter_json_array(io.BytesIO(raw), "data", chunk_size=chunk_size, meta=meta))
+					self.assertEqual(items, expected.get("data", []))
+					# Only values before the array are collected
+					for name, value in meta.items():
+						self.assertEqual(value, expected[name])
+
+	def test_missing_data_array_raises(self):
+		for document in MISSING_DATA:
+			raw = document.encode("utf-8")
+			for chunk_size in range(1, len(raw) + 2):
+				with self.subTest(document=document, chunk_size=chunk_size):
+					with self.assertRaises(ValueError):
+						list(iter_json_array(io.BytesIO(raw), "data", chunk_size=chunk_size))
+
+
+if __name__ == "__main__":
+	unittest.main()